@@ -5,6 +5,11 @@ base62
 Originated from http://blog.suminb.com/archives/558
 """
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 __title__ = 'base62'
 __author__ = 'Sumin Byeon'
 __email__ = 'suminb@gmail.com'
@@ -18,6 +23,11 @@ CHARSET_INVERTED = (
     '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
 )
 
+# widest value decoded with NumPy, 62 ** 10 still fits in an int64
+NUMPY_MAX_WIDTH = 10
+
+_decode_tables = {}
+
 
 def bytes_to_int(s, byteorder='big', signed=False):
     """Converts a byte array to an integer value.
@@ -74,14 +84,48 @@ def decode(b, charset=CHARSET_DEFAULT):
     if b.startswith('0z'):
         b = b[2:]
 
-    l, i, v = len(b), 0, 0
-    for x in b:
-        v += _value(x, charset=charset) * (BASE ** (l - (i + 1)))
-        i += 1
+    table = _decode_table(charset)
+    v = 0
+    try:
+        for x in b:
+            v = v * BASE + table[x]
+    except KeyError:
+        raise ValueError('base62: Invalid character (%s)' % x)
 
     return v
 
 
+def decode_many(values, charset=CHARSET_DEFAULT, use_numpy=None):
+    """Decodes a sequence of base62 encoded values, returns a list of
+    integers equal to ``[decode(b) for b in values]``.
+    NumPy is used when installed and the values are ASCII strings of the
+    same width, ``use_numpy`` forces it on or off.
+    """
+
+    values = list(values)
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    if use_numpy and len(values) > 0:
+        decoded = _decode_many_numpy(values, charset)
+        if decoded is not None:
+            return decoded
+
+    table = _decode_table(charset)
+    decoded = []
+    for b in values:
+        if b.startswith('0z'):
+            b = b[2:]
+        v = 0
+        try:
+            for x in b:
+                v = v * BASE + table[x]
+        except KeyError:
+            raise ValueError('base62: Invalid character (%s)' % x)
+        decoded.append(v)
+
+    return decoded
+
+
 def decodebytes(s, charset=CHARSET_DEFAULT):
     """Decodes a string of base62 data into a bytes object.
     :param s: A string to be decoded in base62
@@ -98,6 +142,49 @@ def decodebytes(s, charset=CHARSET_DEFAULT):
     return bytes(buf)
 
 
+def _decode_table(charset):
+    """Returns the digit value of every character of ``charset``."""
+
+    table = _decode_tables.get(charset)
+    if table is None:
+        table = dict((ch, i) for i, ch in enumerate(charset))
+        _decode_tables[charset] = table
+    return table
+
+
+def _decode_many_numpy(values, charset):
+    """Decodes fixed width values as one array, returns None when they
+    can't be handled this way.
+    """
+
+    width = len(values[0])
+    if width == 0 or width > NUMPY_MAX_WIDTH:
+        return None
+    try:
+        if any(len(b) != width for b in values):
+            return None
+        data = ''.join(values).encode('ascii')
+    except (TypeError, UnicodeEncodeError):
+        return None
+
+    lookup = numpy.full(256, -1, dtype=numpy.int64)
+    for i, ch in enumerate(charset):
+        lookup[ord(ch)] = i
+    digits = lookup[numpy.frombuffer(data, dtype=numpy.uint8).reshape(len(values), width)]
+    if (digits < 0).any():
+        return None
+
+    powers = BASE ** numpy.arange(width - 1, -1, -1, dtype=numpy.int64)
+    decoded = (digits * powers).sum(axis=1).tolist()
+
+    # decode() drops a leading '0z'
+    for index, b in enumerate(values):
+        if b.startswith('0z'):
+            decoded[index] = decode(b, charset=charset)
+
+    return decoded
+
+
 def _value(ch, charset):
     """Decodes an individual digit of a base62 encoded string."""
 
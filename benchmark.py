@@ -0,0 +1,629 @@
+#!/usr/bin/env python3
+import argparse
+import base64
+import concurrent.futures
+import csv
+import datetime
+import io
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import re
+import shlex
+import shutil
+import subprocess
+import tempfile
+import time
+
+import psycopg2
+
+import base62
+import sfcsvimport
+
+
+def legacyMakeItPrintable(content):
+    # makeItPrintable as it was before the regex sanitizer, kept for comparison
+    if str(content).isprintable():
+        return content
+    output = ""
+    i = 0
+    for line in content.splitlines():
+        if not line.isprintable():
+            newLine = ""
+            for c in line:
+                if c.isprintable():
+                    newLine += c
+            line = newLine
+        if i > 0:
+            output += "\n"
+        output += line
+        i += 1
+    return output
+
+
+# characters sprinkled into the generated content, printable ones and line breaks included
+ASCII_DIRT = ["\t", "\x00", "\x07", "\x1b", "\x7f", "\v", "\f", "\x1c", "\x1e"]
+UNICODE_DIRT = ASCII_DIRT + ["\u200b", "\ufeff", "\U0001F600", "\U000E0001", "é", "\x85", "\u2028", "\u2029"]
+# accented text without anything to strip, the common non-ASCII content
+UNICODE_TEXT = ["é", "ü", "ñ", "ß", "ø", "日本", "\U0001F600"]
+
+
+def legacyGetFieldTypeByValue(fieldValue):
+    # getFieldTypeByValue before the precompiled matchers, kept for comparison
+    match = re.findall(r'\D', fieldValue)
+    if len(match) > 0:
+        pattern = re.compile("^\\d{4}\\-\\d{2}\\-\\d{2} \\d{2}:\\d{2}:\\d{2}$")
+        if pattern.match(fieldValue):
+            return "datetime"
+        pattern = re.compile("^\\d{4}\\-\\d{2}\\-\\d{2} \\d{2}:\\d{2}:\\d{2}.\\d{1}$")
+        if pattern.match(fieldValue):
+            return "datetime"
+        pattern = re.compile("^[0-9A-Za-z]{18}$")
+        if pattern.match(fieldValue):
+            return "id"
+        return "string"
+    try:
+        i = int(fieldValue)
+        if(i==0 or i==1):
+            return "bool"
+        return "int"
+    except:
+        pass
+    return None
+
+
+def legacyDecode(b, charset=base62.CHARSET_DEFAULT):
+    # base62.decode before the lookup table, kept for comparison
+    if b.startswith('0z'):
+        b = b[2:]
+    l, i, v = len(b), 0, 0
+    for x in b:
+        v += charset.index(x) * (base62.BASE ** (l - (i + 1)))
+        i += 1
+    return v
+
+
+def legacyAnalyzeRows(csvData, fields):
+    # value loop of resolveFile before the inference engine
+    totalRows = 0
+    for row in csvData:
+        totalRows += 1
+        for fieldName in csvData.fieldnames:
+            if row[fieldName] != "":
+                fieldType = legacyGetFieldTypeByValue(row[fieldName])
+                if not fieldType in fields[fieldName]["types"]:
+                    if fieldType !=None:
+                        fields[fieldName]["types"].append(fieldType)
+            fields[fieldName]["size"] = max(fields[fieldName]["size"], len(str(row[fieldName])))
+    return totalRows
+
+
+def makeDirtyContent(size, dirt=ASCII_DIRT, seed=0):
+    # csv-like text where most lines carry tabs, NULs or other control characters
+    rnd = random.Random(seed)
+    lines = []
+    length = 0
+    while length < size:
+        words = []
+        for _ in range(rnd.randint(4, 12)):
+            word = "".join(rnd.choice("abcdefghijklmnopqrstuvwxyz0123456789") for _ in range(rnd.randint(2, 10)))
+            if rnd.random() < 0.3:
+                word += rnd.choice(dirt)
+            words.append(word)
+        line = ",".join(words)
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines) + "\n"
+
+
+def randomSfId(rnd, prefix):
+    return prefix + "".join(rnd.choice("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz") for _ in range(15))
+
+
+# kinds of the generated custom fields
+CUSTOM_FIELD_KINDS = ["Text", "Number", "Flag", "Amount", "Date", "Lookup"]
+NUMERIC_FIELD_KINDS = ["Number", "Flag", "Amount", "Date", "Lookup"]
+
+
+def makeOpportunityCsv(rows, customFields, seed=0, kinds=CUSTOM_FIELD_KINDS):
+    # wide Opportunity export, standard fields followed by customFields custom ones
+    rnd = random.Random(seed)
+    header = ["Id", "IsDeleted", "AccountId", "Name", "Description", "StageName", "Amount", "Probability",
+              "CloseDate", "Type", "NextStep", "LeadSource", "IsClosed", "IsWon", "ForecastCategory",
+              "CampaignId", "HasOpportunityLineItem", "OwnerId", "CreatedDate", "CreatedById",
+              "LastModifiedDate", "LastModifiedById", "SystemModstamp", "FiscalQuarter", "FiscalYear"]
+    header += ["%s%s__c" % (kinds[i % len(kinds)], i) for i in range(customFields)]
+
+    def value(fieldName):
+        if rnd.random() < 0.2:
+            return ""
+        if fieldName == "Id" or fieldName.endswith("Id") or fieldName.startswith("Lookup"):
+            return randomSfId(rnd, "006")
+        if fieldName.startswith("Is") or fieldName.startswith("Has") or fieldName.startswith("Flag"):
+            return rnd.choice("01")
+        if fieldName.endswith("Date") or fieldName.startswith("Date") or fieldName == "SystemModstamp":
+            return "20%02d-%02d-%02d %02d:%02d:%02d" % (rnd.randint(10, 25), rnd.randint(1, 12), rnd.randint(1, 28), rnd.randint(0, 23), rnd.randint(0, 59), rnd.randint(0, 59))
+        if fieldName in ("Amount", "Probability") or fieldName.startswith("Amount"):
+            return "%d.%02d" % (rnd.randint(0, 1000000), rnd.randint(0, 99))
+        if fieldName in ("FiscalQuarter", "FiscalYear") or fieldName.startswith("Number"):
+            return str(rnd.randint(2, 5000))
+        return " ".join(rnd.choice(["deal", "renewal", "acme", "q3", "upsell", "widget"]) for _ in range(rnd.randint(1, 8)))
+
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(header)
+    for _ in range(rows):
+        writer.writerow([value(fieldName) for fieldName in header])
+    return output.getvalue()
+
+
+# lookups of the generated exports and the key prefix of the object they point to
+EXPORT_LOOKUPS = [("OwnerId", "005"), ("AccountId", "001"), ("CreatedById", "005"), ("LastModifiedById", "005")]
+# custom fields cycle through these, the names carry the type hints of getFieldTypeByName
+EXPORT_CUSTOM_FIELDS = ["Note%s__c", "Quantity%s__c", "IsFlag%s__c", "Amount%s__c", "Renewal%sDate__c", "Contact%sId__c"]
+EXPORT_DIRT = ["\x00", "\x07", "\x1b", "\u200b", "\ufeff"]
+
+# configurations of the import benchmark, each one on top of --import-args
+IMPORT_CONFIGS = [
+    ("insert", ["--loader", "insert"]),
+    ("copy", []),
+    ("copy-binary", ["--copy-format", "binary"]),
+    ("copy-pipeline", ["--engine", "pipeline"]),
+    ("copy-arrow", ["--engine", "arrow"]),
+]
+BENCHMARK_SCHEMA = "sfcsvimport_benchmark"
+
+
+def writeExportCsv(filePath, rows, width, bodySize=0, bodyEvery=100, seed=0, shortEvery=0):
+    # Data Export style csv written row by row: 18 char Ids, *Id lookups, Is* flags,
+    # *Date datetimes, multi-line text with non-printable characters and base64 bodies,
+    # every shortEvery-th row cut to half of its values
+    rnd = random.Random(seed)
+    header = ["Id", "IsDeleted", "Name", "Description", "CreatedDate", "LastModifiedDate", "SystemModstamp"]
+    header += [fieldName for fieldName, prefix in EXPORT_LOOKUPS]
+    if bodySize > 0:
+        header.append("Body")
+    for i in range(max(width - len(header), 0)):
+        header.append(EXPORT_CUSTOM_FIELDS[i % len(EXPORT_CUSTOM_FIELDS)] % i)
+    lookups = dict(EXPORT_LOOKUPS)
+
+    def datetimeValue():
+        return "20%02d-%02d-%02d %02d:%02d:%02d" % (rnd.randint(10, 25), rnd.randint(1, 12), rnd.randint(1, 28), rnd.randint(0, 23), rnd.randint(0, 59), rnd.randint(0, 59))
+
+    def textValue(lines):
+        text = []
+        for _ in range(lines):
+            words = [rnd.choice(["renewal", "acme", "widget", "q3", "\"quoted\"", "a,b", "été"]) for _ in range(rnd.randint(1, 10))]
+            if rnd.random() < 0.1:
+                words.append(rnd.choice(EXPORT_DIRT))
+            text.append(" ".join(words))
+        return "\n".join(text)
+
+    def value(rowNumber, fieldName):
+        if fieldName == "Id":
+            return randomSfId(rnd, "001")
+        if fieldName == "Body":
+            return base64.b64encode(rnd.randbytes(bodySize)).decode() if rowNumber % bodyEvery == 0 else ""
+        if rnd.random() < 0.15:
+            return ""
+        if fieldName in lookups:
+            return randomSfId(rnd, lookups[fieldName])
+        if fieldName.startswith("Contact"):
+            return randomSfId(rnd, "003")
+        if fieldName.startswith("Is"):
+            return rnd.choice("01")
+        if fieldName.endswith("Date") or fieldName.endswith("Date__c") or fieldName == "SystemModstamp":
+            return datetimeValue()
+        if fieldName.startswith("Quantity"):
+            return str(rnd.randint(0, 100000))
+        if fieldName.startswith("Amount"):
+            return "%d.%02d" % (rnd.randint(0, 1000000), rnd.randint(0, 99))
+        if fieldName == "Description":
+            return textValue(rnd.randint(1, 4))
+        return textValue(1)
+
+    with open(filePath, "w", newline='') as fp:
+        writer = csv.writer(fp)
+        writer.writerow(header)
+        for rowNumber in range(rows):
+            values = [value(rowNumber, fieldName) for fieldName in header]
+            if shortEvery > 0 and rowNumber % shortEvery == shortEvery - 1:
+                values = values[:len(values) // 2]
+            writer.writerow(values)
+    return header
+
+
+class StubCursor:
+    def __init__(self, connection):
+        self._connection = connection
+        self._result = []
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        if sql.startswith("SELECT COUNT"):
+            self._result = [(self._connection.rows,)]
+        elif sql.startswith("SELECT") and not " FROM " in sql:
+            # scalar queries like to_regclass answer NULL, no table exists yet
+            self._result = [(None,)]
+        else:
+            self._result = []
+
+    def copy_expert(self, sql, stream, size=8192):
+        while stream.read(size):
+            pass
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def fetchall(self):
+        return self._result
+
+    def __iter__(self):
+        return iter(self._result)
+
+
+class StubConnection:
+    """psycopg2 connection stand-in for the client-only stages: statements are
+    dropped, COPY data is read to the end and counts answer rows."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.autocommit = True
+
+    def cursor(self):
+        return StubCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def connectBenchmarkDatabase(dsn):
+    # a throwaway schema, dropped with everything in it after the run
+    database = psycopg2.connect(dsn)
+    database.autocommit = True
+    cursor = database.cursor()
+    cursor.execute("DROP SCHEMA IF EXISTS " + BENCHMARK_SCHEMA + " CASCADE")
+    cursor.execute("CREATE SCHEMA " + BENCHMARK_SCHEMA)
+    cursor.execute("SET search_path TO " + BENCHMARK_SCHEMA)
+    cursor.execute('CREATE DOMAIN "tinyint" AS smallint')
+    return database
+
+
+def runImport(filePath, importArgs, dsn, rows):
+    # runs in a process of its own, the peak RSS belongs to this import alone
+    sfcsvimport.args = vars(sfcsvimport.getArgumentParser().parse_args(["--file", filePath] + importArgs))
+    salesforce = sfcsvimport.Salesforce_to_PostgreSQL()
+    salesforce._database = connectBenchmarkDatabase(dsn) if dsn else StubConnection(rows)
+    try:
+        salesforce.resolveObject(salesforce.getTableName(filePath), [filePath])
+    finally:
+        if dsn:
+            salesforce._database.cursor().execute("DROP SCHEMA IF EXISTS " + BENCHMARK_SCHEMA + " CASCADE")
+        salesforce._database.close()
+    return salesforce.tableReports[0]
+
+
+def getCommit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def recordHistory(historyPath, record):
+    # appends the record, returns the last one of the same benchmark and setup
+    previous = None
+    if os.path.isfile(historyPath):
+        with open(historyPath) as fp:
+            for line in fp:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry["key"] == record["key"]:
+                    previous = entry
+    with open(historyPath, "a") as fp:
+        fp.write(json.dumps(record) + "\n")
+    return previous
+
+
+def formatChange(value, previous, tolerance, higherIsBetter):
+    if previous == None or value == None or not previous:
+        return "-"
+    change = (value - previous) / previous
+    regression = change < -tolerance if higherIsBetter else change > tolerance
+    return "%+.1f%%%s" % (change * 100, " REGRESSION" if regression else "")
+
+
+def benchmarkImport(rows, width, bodySize, importArgs, dsn, exportDir, historyPath, tolerance):
+    temporary = exportDir == None
+    if temporary:
+        exportDir = tempfile.mkdtemp(prefix="sfcsvimport-benchmark-")
+    else:
+        os.makedirs(exportDir, exist_ok=True)
+    try:
+        filePath = os.path.join(exportDir, "Account.csv")
+        header = writeExportCsv(filePath, rows, width, bodySize)
+
+        print("import: config, rows, columns, seconds, rows_per_s, mb_per_s, peak_rss_mb, rows_per_s_change, peak_rss_change")
+        for configName, configArgs in IMPORT_CONFIGS:
+            if "arrow" in configArgs and sfcsvimport.pyarrow is None:
+                print("import: %s skipped, pyarrow is not installed" % configName)
+                continue
+            # a fresh process per configuration keeps the peak RSS figures apart
+            with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+                report = executor.submit(runImport, filePath, configArgs + importArgs, dsn, rows).result()
+
+            record = {
+                "time": datetime.datetime.now().isoformat(timespec="seconds"),
+                "commit": getCommit(),
+                "python": platform.python_version(),
+                "key": "import %s rows=%s width=%s body=%s args=%s %s" % (configName, rows, len(header), bodySize,
+                    " ".join(importArgs), "database" if dsn else "client-only"),
+                "seconds": report["seconds"],
+                "rows_per_s": report["rows_per_s"],
+                "bytes_per_s": report["bytes_per_s"],
+                "peak_rss_mb": report["peak_rss_mb"],
+                "stages": report["stages"],
+            }
+            previous = recordHistory(historyPath, record) if historyPath else None
+
+            print("import: %s, %s, %s, %.3f, %.0f, %.1f, %s, %s, %s" % (
+                configName,
+                rows,
+                len(header),
+                report["seconds"],
+                report["rows_per_s"],
+                report["bytes_per_s"] / (1024 * 1024),
+                "-" if report["peak_rss_mb"] == None else "%.0f" % report["peak_rss_mb"],
+                formatChange(report["rows_per_s"], previous and previous["rows_per_s"], tolerance, True),
+                formatChange(report["peak_rss_mb"], previous and previous["peak_rss_mb"], tolerance, False),
+            ))
+    finally:
+        if temporary:
+            shutil.rmtree(exportDir)
+
+
+def timeIt(function, *params):
+    start = time.perf_counter()
+    result = function(*params)
+    return time.perf_counter() - start, result
+
+
+def benchmarkSanitizer(sizes, legacyLimit):
+    salesforce = sfcsvimport.Salesforce_to_PostgreSQL()
+
+    print("sanitizer: content, size_mb, new_s, new_mb_per_s, legacy_s, legacy_mb_per_s")
+    for (contentName, dirt), size in itertools.product([("ascii", ASCII_DIRT), ("unicode", UNICODE_DIRT), ("unicode-clean", UNICODE_TEXT)], sizes):
+        content = makeDirtyContent(size, dirt)
+        megabytes = len(content) / (1024 * 1024)
+
+        newTime, output = timeIt(salesforce.makeItPrintable, content)
+        legacyTime = None
+        if size <= legacyLimit:
+            legacyTime, legacyOutput = timeIt(legacyMakeItPrintable, content)
+            # the legacy implementation dropped the final line ending
+            if output.removesuffix("\n") != legacyOutput:
+                raise Exception("sanitizer output differs from the legacy implementation")
+
+        print("sanitizer: %s, %.1f, %.4f, %.1f, %s, %s" % (
+            contentName,
+            megabytes,
+            newTime,
+            megabytes / newTime,
+            "-" if legacyTime is None else "%.4f" % legacyTime,
+            "-" if legacyTime is None else "%.1f" % (megabytes / legacyTime),
+        ))
+
+
+def benchmarkInference(rows, customFields, sampleRows):
+    salesforce = sfcsvimport.Salesforce_to_PostgreSQL()
+    content = makeOpportunityCsv(rows, customFields)
+
+    def legacy():
+        csvData = csv.DictReader(io.StringIO(content))
+        fields = salesforce.newFields(csvData.fieldnames)
+        for fieldName in fields:
+            fields[fieldName]["type"] = None
+        return legacyAnalyzeRows(csvData, fields)
+
+    def inference(fullScan):
+        sfcsvimport.args = {"full_scan": fullScan, "sample_rows": sampleRows}
+        csvData = csv.DictReader(io.StringIO(content))
+        fields = salesforce.newFields(csvData.fieldnames)
+        return salesforce.analyzeRows(csvData, fields)
+
+    print("inference: rows, columns, legacy_s, full_scan_s, sampled_s")
+    legacyTime, _ = timeIt(legacy)
+    fullTime, _ = timeIt(inference, True)
+    sampledTime, _ = timeIt(inference, False)
+    print("inference: %s, %s, %.3f, %.3f, %.3f" % (rows, 25 + customFields, legacyTime, fullTime, sampledTime))
+
+
+def benchmarkIds(rows):
+    salesforce = sfcsvimport.Salesforce_to_PostgreSQL()
+    rnd = random.Random(0)
+    sfIds = [randomSfId(rnd, "00T") for _ in range(rows)]
+
+    legacyTime, expected = timeIt(lambda: [legacyDecode(sfId[5:15]) for sfId in sfIds])
+    decodeTime, decoded = timeIt(lambda: [salesforce.getSqlId(sfId) for sfId in sfIds])
+    pythonTime, pythonDecoded = timeIt(lambda: base62.decode_many([sfId[5:15] for sfId in sfIds], use_numpy=False))
+    if decoded != expected or pythonDecoded != expected:
+        raise Exception("decoded ids differ from the legacy implementation")
+
+    numpyTime = None
+    if base62.numpy is not None:
+        numpyTime, numpyDecoded = timeIt(salesforce.getSqlIds, sfIds)
+        if numpyDecoded != expected:
+            raise Exception("NumPy decoded ids differ from the legacy implementation")
+
+    print("ids: rows, legacy_s, decode_s, decode_many_s, decode_many_numpy_s")
+    print("ids: %s, %.3f, %.3f, %.3f, %s" % (rows, legacyTime, decodeTime, pythonTime, "-" if numpyTime is None else "%.3f" % numpyTime))
+
+
+def benchmarkCopyFormats(rows, customFields):
+    # client side encoding of a numeric heavy export for each way of sending rows
+    salesforce = sfcsvimport.Salesforce_to_PostgreSQL()
+    sfcsvimport.args = {"full_scan": True, "sample_rows": None, "normalize_columns": "*"}
+    content = makeOpportunityCsv(rows, customFields, kinds=NUMERIC_FIELD_KINDS)
+
+    csvData = csv.DictReader(io.StringIO(content))
+    fields = salesforce.newFields(csvData.fieldnames)
+    salesforce.analyzeRows(csvData, fields)
+    salesforce.resolveFieldTypes(fields)
+    records = list(csv.reader(io.StringIO(content)))
+    fieldNames, records = records[0], records[1:]
+
+    encoders = [
+        ("insert", lambda plan: salesforce.encodeRows(iter(records), plan, len(fieldNames), "(", ", ", ")"), sfcsvimport.SQL_CONVERTERS),
+        ("text", lambda plan: salesforce.encodeRows(iter(records), plan, len(fieldNames), "", "\t", "\n"), sfcsvimport.COPY_CONVERTERS),
+        ("binary", lambda plan: salesforce.encodeBinaryRows(iter(records), plan, len(fieldNames)), sfcsvimport.BINARY_CONVERTERS),
+    ]
+
+    print("copy: format, rows, columns, encode_s, rows_per_s, size_mb")
+    for formatName, encoder, converters in encoders:
+        plan = salesforce.getRowPlan(fieldNames, fields, converters)
+        encodeTime, size = timeIt(lambda: sum(len(line) for line in encoder(plan)))
+        print("copy: %s, %s, %s, %.3f, %.0f, %.1f" % (formatName, rows, len(fieldNames), encodeTime, rows / encodeTime, size / (1024 * 1024)))
+
+
+LOADER_CONFIGS = [
+    ("insert", ["--loader", "insert"]),
+    ("copy", []),
+    ("copy-binary", ["--copy-format", "binary"]),
+    ("copy-quarantine", ["--quarantine-dir", "quarantine"]),
+]
+
+
+def checkLoadedRows(name, content, configs=LOADER_CONFIGS):
+    # every loader sends as many rows as the analysis counted
+    exportDir = tempfile.mkdtemp(prefix="sfcsvimport-check-")
+    try:
+        filePath = os.path.join(exportDir, "Account.csv")
+        with open(filePath, "w", newline='') as fp:
+            fp.write(content)
+        for configName, configArgs in configs:
+            configArgs = [os.path.join(exportDir, arg) if arg == "quarantine" else arg for arg in configArgs]
+            sfcsvimport.args = vars(sfcsvimport.getArgumentParser().parse_args(["--file", filePath] + configArgs))
+            salesforce = sfcsvimport.Salesforce_to_PostgreSQL()
+            fields, totalRows = salesforce.getSchema(filePath)
+            salesforce._database = StubConnection(totalRows)
+            if sfcsvimport.args["quarantine_dir"]:
+                salesforce.resetQuarantine("Account", fields)
+            stats = salesforce.loadPart("Account", filePath, fields)
+            if stats["rows"] != totalRows:
+                raise Exception("%s: %s loaded %s rows, %s were analyzed" % (name, configName, stats["rows"], totalRows))
+        print("checks: %s, %s configurations, ok" % (name, len(configs)))
+    finally:
+        shutil.rmtree(exportDir)
+
+
+def runChecks():
+    header = "Id,Name,Amount__c\r\n"
+    rows = ["0015g00000%05dAAA,Name %s,%s.50\r\n" % (i, i, i) for i in range(10)]
+    checkLoadedRows("blank lines", header + "".join(rows[:4]) + "\r\n" + "".join(rows[4:]) + "\r\n\r\n")
+
+
+def compareEngines(salesforce, filePath, fieldNames):
+    # (infer_s, encode_s, fields, COPY lines) of the Python and Arrow engines, which must be equal
+    results = {}
+    for engine in ["sync", "arrow"]:
+        sfcsvimport.args = {"engine": engine, "full_scan": True, "sample_rows": None, "normalize_columns": "*", "schema_cache": None}
+        inferTime, (fields, totalRows) = timeIt(salesforce.getSchema, filePath)
+        plan = salesforce.getRowPlan(fieldNames, fields, sfcsvimport.COPY_CONVERTERS)
+        if engine == "arrow":
+            encoder = lambda: list(salesforce.encodeBatches(salesforce.readCsvBatches(filePath, fieldNames), plan))
+        else:
+            encoder = lambda: list(salesforce.encodeRows(itertools.islice(csv.reader(salesforce.readCsvLines(filePath)), 1, None), plan, len(fieldNames), "", "\t", "\n"))
+        encodeTime, lines = timeIt(encoder)
+        results[engine] = (inferTime, encodeTime, fields, lines)
+
+    if results["arrow"][2] != results["sync"][2]:
+        raise Exception("%s: the arrow engine infers other types than the sync engine" % os.path.basename(filePath))
+    if results["arrow"][3] != results["sync"][3]:
+        raise Exception("%s: the arrow engine encodes other COPY rows than the sync engine" % os.path.basename(filePath))
+    return results
+
+
+def benchmarkEngines(rows, width, bodySize):
+    # inference and text COPY encoding of the Python and Arrow engines on the same export
+    if sfcsvimport.pyarrow is None:
+        print("engines: skipped, pyarrow is not installed")
+        return
+    salesforce = sfcsvimport.Salesforce_to_PostgreSQL()
+    exportDir = tempfile.mkdtemp(prefix="sfcsvimport-benchmark-")
+    try:
+        filePath = os.path.join(exportDir, "Account.csv")
+        fieldNames = writeExportCsv(filePath, rows, width, bodySize)
+
+        results = compareEngines(salesforce, filePath, fieldNames)
+
+        # short rows make the arrow engine read the rest of the file with the csv module,
+        # small blocks have it do so in the middle of the file
+        shortPath = os.path.join(exportDir, "Short.csv")
+        shortNames = writeExportCsv(shortPath, 2000, width, bodySize, shortEvery=500)
+        salesforce.arrowBlockSize = 256 * 1024
+        compareEngines(salesforce, shortPath, shortNames)
+        del salesforce.arrowBlockSize
+
+        print("engines: engine, rows, columns, infer_s, encode_s, rows_per_s")
+        for engine, (inferTime, encodeTime, fields, lines) in results.items():
+            print("engines: %s, %s, %s, %.3f, %.3f, %.0f" % (engine, rows, len(fieldNames), inferTime, encodeTime, rows / (inferTime + encodeTime)))
+    finally:
+        shutil.rmtree(exportDir)
+
+
+if (__name__ == "__main__"):
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--benchmarks', help='comma separated benchmarks to run', default='checks,sanitizer,inference,ids,copy,engines,import')
+    parser.add_argument('--sizes', help='comma separated content sizes in MB', default='1,2,4,8,16')
+    parser.add_argument('--legacy-limit', help='largest size in MB to run the legacy implementation on', type=float, default=4)
+    parser.add_argument('--rows', help='rows of the generated exports', type=int, default=20000)
+    parser.add_argument('--custom-fields', help='custom fields of the generated Opportunity export', type=int, default=100)
+    parser.add_argument('--sample-rows', help='sample size of the sampled type inference', type=int, default=2500)
+    parser.add_argument('--width', help='columns of the generated export of the import benchmark', type=int, default=60)
+    parser.add_argument('--body-size', help='bytes of the base64 encoded Body of every 100th row, 0 for no Body column', type=int, default=65536)
+    parser.add_argument('--import-args', help='sfcsvimport.py options added to every import configuration, e.g. "--fast-load"', default='')
+    parser.add_argument('--dsn', help='throwaway PostgreSQL database for the import benchmark, client-only stages without it')
+    parser.add_argument('--export-dir', help='keep the generated export in this directory')
+    parser.add_argument('--history', help='JSON lines file the import results are appended to and compared with')
+    parser.add_argument('--tolerance', help='relative change of rows/s or peak RSS flagged as a regression', type=float, default=0.1)
+
+    args = vars(parser.parse_args())
+    benchmarks = args["benchmarks"].split(",")
+
+    logging.basicConfig(level=logging.WARNING)
+
+    if "checks" in benchmarks:
+        runChecks()
+
+    if "sanitizer" in benchmarks:
+        sizes = [int(float(size) * 1024 * 1024) for size in args["sizes"].split(",")]
+        benchmarkSanitizer(sizes, args["legacy_limit"] * 1024 * 1024)
+
+    if "inference" in benchmarks:
+        benchmarkInference(args["rows"], args["custom_fields"], args["sample_rows"])
+
+    if "ids" in benchmarks:
+        benchmarkIds(args["rows"] * 10)
+
+    if "copy" in benchmarks:
+        benchmarkCopyFormats(args["rows"], args["custom_fields"])
+
+    if "engines" in benchmarks:
+        benchmarkEngines(args["rows"], args["width"], args["body_size"])
+
+    if "import" in benchmarks:
+        benchmarkImport(args["rows"], args["width"], args["body_size"], shlex.split(args["import_args"]), args["dsn"],
+            args["export_dir"], args["history"], args["tolerance"])
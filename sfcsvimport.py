@@ -10,6 +10,778 @@ import re
 import base62
 import unicodedata
 import traceback
+import itertools
+import concurrent.futures
+import hashlib
+import json
+import psycopg2.pool
+import gzip
+import zipfile
+import queue
+import threading
+import struct
+import datetime
+import functools
+import binascii
+import collections
+import contextlib
+import time
+import cProfile
+import array
+import bisect
+import heapq
+import shutil
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+    import pyarrow.compute
+    import pyarrow.csv
+except ImportError:
+    pyarrow = None
+
+
+args = None
+logger = logging.getLogger("sf_csv_export_to_database.py")
+
+# connection pool of a --jobs worker process
+_pool = None
+
+
+# csv files in a zip archive are addressed as <archive>!<member>
+ARCHIVE_MEMBER_SEPARATOR = "!"
+# compressed single csv files, read as streams
+COMPRESSED_SUFFIXES = (".gz", ".zst", ".zstd")
+
+
+# NULL is sent as \N in the COPY text format
+COPY_NULL = "\\N"
+
+
+def _nonPrintableRanges(first, last):
+    # regex ranges of the non-printable code points in [first, last], \r and \n excluded
+    ranges = []
+    start = None
+    for code in range(first, last + 2):
+        strip = code <= last and not chr(code).isprintable() and chr(code) not in "\r\n"
+        if strip and start is None:
+            start = code
+        elif not strip and start is not None:
+            ranges.append(re.escape(chr(start)) + "-" + re.escape(chr(code - 1)))
+            start = None
+    return "".join(ranges)
+
+
+# value matchers of the type inference, used with fullmatch, ASCII digits only
+# as PostgreSQL doesn't read other digits as numbers
+NON_DIGIT_PATTERN = re.compile(r"\D", re.ASCII)
+# positive integers are the values without any non-digit
+NEGATIVE_INTEGER_PATTERN = re.compile(r"^-\d{1,18}$", re.ASCII)
+# fits in decimal(15,2) without rounding
+DECIMAL_PATTERN = re.compile(r"^-?\d{1,13}\.\d{1,2}$", re.ASCII)
+# digits of the longest int decimal(15,2) holds, int and float columns are strings beyond
+DECIMAL_INTEGER_DIGITS = 13
+DATETIME_PATTERN = re.compile(r"^\d{4}\-\d{2}\-\d{2} \d{2}:\d{2}:\d{2}(.\d)?$", re.ASCII)
+ID_PATTERN = re.compile(r"^[0-9A-Za-z]{18}$")
+NUMERIC_TYPE_RANKS = {"bool": 0, "int": 1, "float": 2}
+# field types of the columns getSqlColumnType creates on PostgreSQL, tinyint is a smallint domain
+COLUMN_FIELD_TYPES = {"character varying": "string", "text": "string", "bigint": "int", "numeric": "float",
+    "timestamp without time zone": "datetime", "smallint": "bool", "bytea": "base64"}
+# Body and VersionData hold base64 blobs, columns with a value of this size
+# whose values are all base64 are decoded to bytes
+BASE64_MIN_SIZE = 1024
+# used with fullmatch, a final newline doesn't match
+BASE64_PATTERN = re.compile(r"(?:[A-Za-z0-9+/]{4})*(?:[A-Za-z0-9+/]{2}==|[A-Za-z0-9+/]{3}=)?")
+BASE64_STRICT_MODE = sys.version_info >= (3, 11)
+
+# blobs are far above the default field limit of 128 KB
+csv.field_size_limit(2 ** 31 - 1)
+
+# part number of a multi-part export: Attachment-1, Attachment_2, Attachment (3)
+PART_SUFFIX_PATTERN = re.compile(r"(?:[-_]\d+| \(\d+\))$")
+
+# sanitizer tables, line endings are never stripped and the other line breaks
+# of str.splitlines become \n, the lines the sanitizer used to split them into
+LINE_BREAKS = "\v\f\x1c\x1d\x1e\x85\u2028\u2029"
+ASCII_LINE_BREAKS = bytes.maketrans(LINE_BREAKS[:5].encode("ascii"), b"\n" * 5)
+ASCII_NON_PRINTABLE = bytes(c for c in range(128) if not chr(c).isprintable() and chr(c) not in "\r\n" + LINE_BREAKS)
+BMP_LINE_BREAKS = re.compile("[" + LINE_BREAKS + "]")
+BMP_NON_PRINTABLE = re.compile("[" + _nonPrintableRanges(0, 0xFFFF) + "]+")
+ASTRAL_CHARACTERS = re.compile("[\U00010000-\U0010FFFF]+")
+
+
+# converters of the row plans, one per column type, empty values are NULL
+def copyPrimaryId(value):
+    return str(base62.decode(value[5:15])) + "\t" + value
+
+
+def copyNumber(value):
+    return value if value else COPY_NULL
+
+
+def copyId(value):
+    return str(base62.decode(value[5:15])) if value else COPY_NULL
+
+
+def escapeCopy(value):
+    # escapes of the COPY text format, most values have none and are returned
+    # as they are, chained replaces are several times faster than str.translate
+    if "\\" in value or "\t" in value or "\n" in value or "\r" in value:
+        return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    return value
+
+
+def copyDatetime(value):
+    return escapeCopy(value[:19]) if value else COPY_NULL
+
+
+def copyString(value):
+    return escapeCopy(value) if value else COPY_NULL
+
+
+def copyAsciiString(value):
+    if not value:
+        return COPY_NULL
+    return escapeCopy(unicodedata.normalize('NFKD', value).encode('ascii','ignore').decode())
+
+
+def decodeBase64(value):
+    # invalid values fail like in the database, a2b_base64 only checks them
+    # itself from Python 3.11 on and skips the characters it doesn't know before
+    if BASE64_STRICT_MODE:
+        return binascii.a2b_base64(value, strict_mode=True)
+    if BASE64_PATTERN.fullmatch(value) == None:
+        raise binascii.Error("invalid base64 value")
+    return binascii.a2b_base64(value)
+
+
+def copyBase64(value):
+    # bytea hex input, its backslash escaped for the text format, tables with
+    # base64 columns are copied in binary, see copyDataBulk
+    return "\\\\x" + decodeBase64(value).hex() if value else COPY_NULL
+
+
+def sqlPrimaryId(value):
+    return str(base62.decode(value[5:15])) + ", '" + value + "'"
+
+
+def sqlNumber(value):
+    return value if value else "NULL"
+
+
+def sqlId(value):
+    return str(base62.decode(value[5:15])) if value else "NULL"
+
+
+def sqlDatetime(value):
+    return "'" + value[:19].replace("'", "''") + "'" if value else "NULL"
+
+
+def sqlString(value):
+    return "'" + value.replace("'", "''") + "'" if value else "NULL"
+
+
+def sqlBase64(value):
+    # decoded by the server
+    return "decode('" + value.replace("'", "''") + "', 'base64')" if value else "NULL"
+
+
+def sqlAsciiString(value):
+    if not value:
+        return "NULL"
+    return "'" + unicodedata.normalize('NFKD', value).encode('ascii','ignore').decode().replace("'", "''") + "'"
+
+
+COPY_CONVERTERS = {
+    "primary": copyPrimaryId,
+    "int": copyNumber,
+    "bool": copyNumber,
+    "float": copyNumber,
+    "id": copyId,
+    "datetime": copyDatetime,
+    "string": copyString,
+    "ascii": copyAsciiString,
+    "base64": copyBase64
+}
+
+SQL_CONVERTERS = {
+    "primary": sqlPrimaryId,
+    "int": sqlNumber,
+    "bool": sqlNumber,
+    "float": sqlNumber,
+    "id": sqlId,
+    "datetime": sqlDatetime,
+    "string": sqlString,
+    "ascii": sqlAsciiString,
+    "base64": sqlBase64
+}
+
+
+# binary COPY framing, every value is preceded by its length, -1 is NULL
+BINARY_COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+BINARY_COPY_TRAILER = struct.pack(">h", -1)
+BINARY_NULL = struct.pack(">i", -1)
+BINARY_FIELD_COUNT = struct.Struct(">h")
+BINARY_LENGTH = struct.Struct(">i")
+BINARY_SMALLINT = struct.Struct(">ih")
+BINARY_BIGINT = struct.Struct(">iq")
+# length, ndigits, weight, sign and dscale of a numeric followed by its base
+# 10000 digits, one struct per digit count, decimal(15,2) needs at most 5
+BINARY_NUMERICS = [struct.Struct(">ihhHh%dH" % count) for count in range(9)]
+BINARY_NUMERIC_NEGATIVE = 0x4000
+# timestamps are microseconds since 2000-01-01
+POSTGRES_EPOCH_ORDINAL = datetime.date(2000, 1, 1).toordinal()
+
+
+# binary converters append the length and value of a column to the row buffer
+def binaryPrimaryId(buffer, value):
+    buffer += BINARY_BIGINT.pack(8, base62.decode(value[5:15]))
+    binaryString(buffer, value)
+
+
+def binaryBigint(buffer, value):
+    buffer += BINARY_BIGINT.pack(8, int(value)) if value else BINARY_NULL
+
+
+def binarySmallint(buffer, value):
+    buffer += BINARY_SMALLINT.pack(2, int(value)) if value else BINARY_NULL
+
+
+def binaryId(buffer, value):
+    buffer += BINARY_BIGINT.pack(8, base62.decode(value[5:15])) if value else BINARY_NULL
+
+
+def binaryDecimal(buffer, value):
+    if not value:
+        buffer += BINARY_NULL
+        return
+    sign = 0
+    if value[0] == "-":
+        sign = BINARY_NUMERIC_NEGATIVE
+        value = value[1:]
+    integer, _, fraction = value.partition(".")
+
+    # the fraction is padded to whole base 10000 digits
+    fractionDigits = -(-len(fraction) // 4)
+    number = int(integer + fraction) * 10 ** (fractionDigits * 4 - len(fraction))
+    weight = -fractionDigits - 1
+    digits = []
+    while number:
+        number, digit = divmod(number, 10000)
+        weight += 1
+        # zero digits at the end are implied by the weight
+        if digit or digits:
+            digits.append(digit)
+    if not digits:
+        weight = 0
+        sign = 0
+    digits.reverse()
+
+    count = len(digits)
+    numeric = BINARY_NUMERICS[count] if count < len(BINARY_NUMERICS) else struct.Struct(">ihhHh%dH" % count)
+    buffer += numeric.pack(8 + 2 * count, count, weight, sign, len(fraction), *digits)
+
+
+@functools.lru_cache(maxsize=65536)
+def getEpochSeconds(date):
+    return (datetime.date(int(date[0:4]), int(date[5:7]), int(date[8:10])).toordinal() - POSTGRES_EPOCH_ORDINAL) * 86400
+
+
+@functools.lru_cache(maxsize=86400)
+def getDaySeconds(time):
+    return int(time[0:2]) * 3600 + int(time[3:5]) * 60 + int(time[6:8])
+
+
+def binaryDatetime(buffer, value):
+    if not value:
+        buffer += BINARY_NULL
+        return
+    # fractions are cut like in the text formats, a date alone is midnight
+    seconds = getEpochSeconds(value[:10])
+    if len(value) >= 19:
+        seconds += getDaySeconds(value[11:19])
+    buffer += BINARY_BIGINT.pack(8, seconds * 1000000)
+
+
+def binaryString(buffer, value):
+    if not value:
+        buffer += BINARY_NULL
+        return
+    data = value.encode()
+    buffer += BINARY_LENGTH.pack(len(data))
+    buffer += data
+
+
+def binaryBase64(buffer, value):
+    if not value:
+        buffer += BINARY_NULL
+        return
+    data = decodeBase64(value)
+    buffer += BINARY_LENGTH.pack(len(data))
+    buffer += data
+
+
+def binaryAsciiString(buffer, value):
+    if not value:
+        buffer += BINARY_NULL
+        return
+    data = unicodedata.normalize('NFKD', value).encode('ascii','ignore')
+    buffer += BINARY_LENGTH.pack(len(data))
+    buffer += data
+
+
+BINARY_CONVERTERS = {
+    "primary": binaryPrimaryId,
+    "int": binaryBigint,
+    "bool": binarySmallint,
+    "float": binaryDecimal,
+    "id": binaryId,
+    "datetime": binaryDatetime,
+    "string": binaryString,
+    "ascii": binaryAsciiString,
+    "base64": binaryBase64
+}
+
+
+# --engine arrow converts the columns of a record batch at once, to the text of
+# the COPY converters above, with pyarrow.compute kernels
+def arrowEscape(values):
+    for character, escaped in (("\\", "\\\\"), ("\t", "\\t"), ("\n", "\\n"), ("\r", "\\r")):
+        values = pyarrow.compute.replace_substring(values, character, escaped)
+    return values
+
+
+def arrowNull(values, encoded):
+    # encoded values, NULL where the value was empty
+    return pyarrow.compute.if_else(pyarrow.compute.equal(values, ""), COPY_NULL, encoded)
+
+
+def arrowDecodeIds(values):
+    # same numbers as getSqlIds, decoded in bulk
+    decoded = base62.decode_many(pyarrow.compute.utf8_slice_codeunits(values, 5, 15).to_pylist())
+    return pyarrow.compute.cast(pyarrow.array(decoded, pyarrow.int64()), pyarrow.string())
+
+
+def arrowPrimaryId(values):
+    return pyarrow.compute.binary_join_element_wise(arrowDecodeIds(values), values, "\t")
+
+
+def arrowNumber(values):
+    return arrowNull(values, values)
+
+
+def arrowId(values):
+    present = pyarrow.compute.not_equal(values, "")
+    return pyarrow.compute.replace_with_mask(arrowNull(values, values), present, arrowDecodeIds(pyarrow.compute.filter(values, present)))
+
+
+def arrowDatetime(values):
+    return arrowNull(values, arrowEscape(pyarrow.compute.utf8_slice_codeunits(values, 0, 19)))
+
+
+def arrowString(values):
+    return arrowNull(values, arrowEscape(values))
+
+
+def arrowAsciiString(values):
+    # NFKD keeps ASCII values as they are, the others are folded one by one
+    folded = values
+    other = pyarrow.compute.invert(pyarrow.compute.string_is_ascii(values))
+    if pyarrow.compute.any(other).as_py():
+        normalized = [unicodedata.normalize('NFKD', value).encode('ascii','ignore').decode()
+            for value in pyarrow.compute.filter(values, other).to_pylist()]
+        folded = pyarrow.compute.replace_with_mask(values, other, pyarrow.array(normalized, pyarrow.string()))
+    return arrowNull(values, arrowEscape(folded))
+
+
+# converters without a kernel, like copyBase64, run on the values one by one
+ARROW_CONVERTERS = {
+    copyPrimaryId: arrowPrimaryId,
+    copyNumber: arrowNumber,
+    copyId: arrowId,
+    copyDatetime: arrowDatetime,
+    copyString: arrowString,
+    copyAsciiString: arrowAsciiString
+}
+# converters of the Id columns, their values are decoded a batch at a time
+ARROW_ID_CONVERTERS = (copyPrimaryId, copyId)
+
+# patterns of getFieldTypeByValue for the vectorized inference of --engine arrow,
+# values with non-ASCII characters or a newline are typed by getFieldTypeByValue
+ARROW_DIGITS_PATTERN = "^[0-9]+$"
+ARROW_FLAG_PATTERN = "^0*[01]$"
+ARROW_VALUE_PATTERNS = [(fieldType, pattern.pattern.replace(r"\d", "[0-9]")) for fieldType, pattern in
+    [("int", NEGATIVE_INTEGER_PATTERN), ("float", DECIMAL_PATTERN), ("datetime", DATETIME_PATTERN), ("id", ID_PATTERN)]]
+# $ of RE2 only matches at the end, like fullmatch
+ARROW_BASE64_PATTERN = "^" + BASE64_PATTERN.pattern + "$"
+
+
+def sliceBatches(batches, start, stop=None):
+    # rows [start, stop) of the record batches, like itertools.islice
+    offset = 0
+    for batch in batches:
+        if stop != None and offset >= stop:
+            break
+        first = max(start - offset, 0)
+        last = batch.num_rows if stop == None else min(batch.num_rows, stop - offset)
+        offset += batch.num_rows
+        if last > first:
+            yield batch.slice(first, last - first)
+
+
+# stages timed per table, see _Timings and --report, ids are the Ids decoded
+# in bulk, those of the row converters are part of encode
+STAGES = ["read", "sanitize", "infer", "encode", "ids", "database", "wait", "finish"]
+
+
+def getPeakRss():
+    # peak resident set size in MB of this process and of its finished children
+    if resource == None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def sortIds(ids):
+    if numpy != None:
+        return array.array("q", numpy.sort(numpy.frombuffer(ids, dtype=numpy.int64)).tobytes())
+    return array.array("q", sorted(ids))
+
+
+def countMissingIds(ids, values):
+    # values not found in the sorted ids, a binary search per value
+    if numpy != None:
+        ids = numpy.frombuffer(ids, dtype=numpy.int64)
+        values = numpy.frombuffer(values, dtype=numpy.int64)
+        if len(ids) == 0:
+            return len(values)
+        positions = numpy.minimum(numpy.searchsorted(ids, values), len(ids) - 1)
+        return int(numpy.count_nonzero(ids[positions] != values))
+    missing = 0
+    for value in values:
+        position = bisect.bisect_left(ids, value)
+        if position == len(ids) or ids[position] != value:
+            missing += 1
+    return missing
+
+
+def readIds(filePaths, merge=False):
+    # int64 arrays saved by _IdCollector, merge keeps sorted arrays sorted
+    arrays = []
+    for filePath in filePaths:
+        ids = array.array("q")
+        with open(filePath, "rb") as fp:
+            ids.frombytes(fp.read())
+        arrays.append(ids)
+    if len(arrays) == 1:
+        return arrays[0]
+    if merge and numpy == None:
+        return array.array("q", heapq.merge(*arrays))
+    ids = array.array("q")
+    for part in arrays:
+        ids.extend(part)
+    return sortIds(ids) if merge else ids
+
+
+class _Timings:
+    """Seconds spent per stage. A nested stage pauses the enclosing one, so the
+    stages of a thread never overlap. Threads and worker processes add up."""
+
+    def __init__(self):
+        self.seconds = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        stack = self._local.__dict__.setdefault("stack", [])
+        now = time.perf_counter()
+        if stack:
+            self.add({stack[-1][0]: now - stack[-1][1]})
+        stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            name, started = stack.pop()
+            self.add({name: now - started})
+            if stack:
+                stack[-1][1] = now
+
+    def add(self, seconds):
+        with self._lock:
+            for name in seconds:
+                self.seconds[name] = self.seconds.get(name, 0) + seconds[name]
+
+
+class _FileRange(io.RawIOBase):
+    """Raw stream reading at most length bytes from the current position of fp."""
+
+    def __init__(self, fp, length):
+        self._fp = fp
+        self._remaining = length
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self._remaining)
+        if size <= 0:
+            return 0
+        data = self._fp.read(size)
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        self._fp.close()
+        super().close()
+
+
+class _TextStream(io.RawIOBase):
+    """Binary file over text chunks, utf-8 encoded one chunk at a time."""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._buffer = b""
+        self._offset = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while self._offset >= len(self._buffer):
+            chunk = next(self._chunks, None)
+            if chunk == None:
+                return 0
+            self._buffer = chunk.encode("utf-8")
+            self._offset = 0
+        size = min(len(buffer), len(self._buffer) - self._offset)
+        buffer[:size] = self._buffer[self._offset:self._offset + size]
+        self._offset += size
+        return size
+
+
+class _CopyStream:
+    """File-like wrapper feeding encoded COPY lines to cursor.copy_expert,
+    stops after maxRows lines or once maxSize characters were read. Binary
+    COPY lines are bytes, framed by a header and a trailer."""
+
+    def __init__(self, lines, maxRows, maxSize, header="", trailer="", timings=None):
+        self._lines = lines
+        self._timings = timings
+        self._buffer = header
+        self._offset = 0
+        self._trailer = trailer
+        self._ended = False
+        self._maxRows = maxRows
+        self._maxSize = maxSize
+        self.rowCount = 0
+        self.size = 0
+
+    def read(self, size=-1):
+        if self._timings == None:
+            return self._read(size)
+        # rows are encoded while the database waits for them
+        with self._timings.stage("encode"):
+            return self._read(size)
+
+    def _read(self, size):
+        # a long line is handed out in slices, the rest of it is never copied
+        if size >= 0 and len(self._buffer) - self._offset >= size:
+            self._offset += size
+            return self._buffer[self._offset - size:self._offset]
+        parts = [self._buffer[self._offset:]]
+        length = len(parts[0])
+        while (size < 0 or length < size) and not self._ended:
+            line = None
+            if self.rowCount < self._maxRows and self.size < self._maxSize:
+                line = next(self._lines, None)
+            if line is None:
+                line = self._trailer
+                self._ended = True
+            else:
+                self.rowCount += 1
+                self.size += len(line)
+            parts.append(line)
+            length += len(line)
+        data = self._trailer[:0].join(parts)
+        if size < 0 or len(data) <= size:
+            self._buffer = data[:0]
+            self._offset = 0
+            return data
+        self._buffer = data
+        self._offset = size
+        return data[:size]
+
+
+class _Quarantine:
+    """Rows of a load rejected by the database or by their converters. They are
+    appended to the quarantine file of the table with their source line and
+    error, in the column order of the table, once their batch is committed."""
+
+    def __init__(self, path, filePath, start, fieldNames, columns):
+        self._path = path
+        self._filePath = filePath
+        self._start = start
+        self._fieldNames = fieldNames
+        self._columns = columns
+        # (ordinal, line, row) of the encoded rows not sent yet
+        self.pending = collections.deque()
+        # (ordinal, csv line) of the rejected rows not committed yet, the
+        # encoder thread of the pipeline engine rejects while the loader flushes
+        self._rejects = []
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def encode(self, rows, encode):
+        # rows are (line, row) pairs, one encoder run per row so a bad value
+        # only rejects its own row
+        for ordinal, (line, row) in enumerate(rows):
+            try:
+                encoded = next(encode((row,)))
+            except Exception as e:
+                self.reject((ordinal, line, row), e)
+                continue
+            self.pending.append((ordinal, line, row))
+            yield encoded
+
+    def reject(self, source, error):
+        ordinal, line, row = source
+        values = dict(zip(self._fieldNames, row))
+        output = io.StringIO()
+        csv.writer(output).writerow([self._filePath, "" if self._start == None else self._start, line, str(error).strip()]
+            + [values.get(column, "") for column in self._columns])
+        with self._lock:
+            self._rejects.append((ordinal, output.getvalue()))
+            self.rejected += 1
+
+    def flush(self, rows):
+        # the rejected rows among the first rows of the load, those the journal
+        # counts as done, a resumed load skips them instead of rejecting them again
+        with self._lock:
+            flushed = [output for ordinal, output in self._rejects if ordinal < rows]
+            self._rejects = [reject for reject in self._rejects if reject[0] >= rows]
+        if not flushed:
+            return 0
+        # a single append per commit, parallel chunks share the file
+        fd = os.open(self._path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+        try:
+            os.write(fd, "".join(flushed).encode())
+        finally:
+            os.close(fd)
+        return len(flushed)
+
+
+class _IdCollector:
+    """Ids of a load, the primary Ids of the object and the values of its
+    lookup columns. They are decoded per column and key prefix a block at a
+    time and appended as int64 values to the relations directory of the table,
+    one file per column and prefix for every file or chunk loaded, see
+    resolveRelations."""
+
+    # ids decoded at a time
+    blockSize = 65536
+
+    def __init__(self, path, filePath, start, fieldNames, fields, timings=None):
+        self._path = path
+        self._timings = timings
+        # a new load of the same file or chunk replaces its files
+        self._unit = hashlib.sha1(("%s:%s" % (filePath, start)).encode()).hexdigest()[:16]
+        self._columns = [(index, fieldName) for index, fieldName in enumerate(fieldNames)
+            if fieldName == "Id" or fields[fieldName]["type"] == "id"]
+        # (column, prefix) -> encoded ids not decoded yet
+        self._pending = {}
+        # (column, prefix) of the files written so far
+        self._keys = set()
+
+    def collect(self, rows, numbered=False):
+        # rows are passed on as they are, numbered ones are (line, row) pairs
+        columns = self._columns
+        for item in rows:
+            row = item[1] if numbered else item
+            if not row:
+                continue
+            for index, fieldName in columns:
+                # 18 character ids, the loader fails on other values in its own way
+                if index < len(row) and len(row[index]) == 18:
+                    self._add(fieldName, row[index])
+            yield item
+
+    def collectBatches(self, batches):
+        # record batches of --engine arrow, passed on as they are
+        for batch in batches:
+            for index, fieldName in self._columns:
+                for value in batch.column(index).to_pylist():
+                    if len(value) == 18:
+                        self._add(fieldName, value)
+            yield batch
+
+    def _add(self, fieldName, value):
+        key = (fieldName, value[:3])
+        values = self._pending.get(key)
+        if values == None:
+            values = self._pending[key] = []
+        values.append(value[5:15])
+        if len(values) >= self.blockSize:
+            self._decode(key)
+
+    def _decode(self, key):
+        if self._timings == None:
+            return self._decodeIds(key)
+        with self._timings.stage("ids"):
+            return self._decodeIds(key)
+
+    def _decodeIds(self, key):
+        values = self._pending.pop(key)
+        if not key[1].isalnum():
+            return
+        try:
+            decoded = base62.decode_many(values)
+        except ValueError:
+            # values the loader can't convert either, the rows fail on their own
+            decoded = []
+            for value in values:
+                try:
+                    decoded.append(base62.decode(value))
+                except ValueError:
+                    pass
+        # only the blocks not decoded yet are kept in memory
+        if not key in self._keys:
+            os.makedirs(self._path, exist_ok=True)
+        with open(self._getPath(key) + ".tmp", "ab" if key in self._keys else "wb") as fp:
+            array.array("q", decoded).tofile(fp)
+        self._keys.add(key)
+
+    def _getPath(self, key):
+        return os.path.join(self._path, "%s.%s.%s.q" % (self._unit, key[0], key[1]))
+
+    def save(self):
+        for key in list(self._pending):
+            self._decode(key)
+        for key in self._keys:
+            filePath = self._getPath(key)
+            if key[0] == "Id":
+                # primary Ids are saved sorted, lookups are searched in them
+                ids = sortIds(readIds([filePath + ".tmp"]))
+                with open(filePath + ".tmp", "wb") as fp:
+                    ids.tofile(fp)
+            os.replace(filePath + ".tmp", filePath)
 
 
 class Salesforce_to_PostgreSQL:
@@ -17,29 +789,117 @@ class Salesforce_to_PostgreSQL:
     # database
     _database = None
 
+    def __init__(self):
+        self.schemaCacheStats = {"hit": 0, "widened": 0, "miss": 0}
+        self._journal = None
+        self.timings = _Timings()
+        self.tableReports = []
+
+    # default rows per COPY and per INSERT statement, see --batch-rows
+    copyBatchRows = 100000
+    insertBatchRows = 100
+
+    # characters read from disk at a time when streaming csv files
+    readChunkSize = 1024 * 1024
+
+    # encoded rows handed over at a time by the --engine pipeline producer,
+    # fewer when they reach pipelineBlockSize characters
+    pipelineBlockRows = 1000
+    pipelineBlockSize = 1024 * 1024
+
+    # bytes parsed at a time by --engine arrow, a record must fit in one block
+    arrowBlockSize = 64 * 1024 * 1024
+    # rows per record batch when the rows of a file don't all fit its header
+    arrowFallbackRows = 65536
+
     def makeItPrintable(self, content):
-        if str(content).isprintable():
+        # whole buffer at once, line endings are kept as is
+        if content.isascii():
+            return content.encode("ascii").translate(ASCII_LINE_BREAKS, ASCII_NON_PRINTABLE).decode("ascii")
+        # most non-ASCII content, accented text of international orgs, is clean
+        if content.replace("\n", "").replace("\r", "").isprintable():
             return content
-        output = ""
-        i = 0
-        for line in content.splitlines():
-            if not line.isprintable():
-                newLine = ""
-                for c in line:
-                    if c.isprintable():
-                        newLine += c
-                line = newLine
-            if i > 0:
-                output += "\n"
-            output += line
-            i += 1
-        return output
-
-    def getFileContent(self, filePath):
-        output = ""
-        with open(filePath) as fp:
-            output = fp.read()
-        return output
+        content = BMP_NON_PRINTABLE.sub("", BMP_LINE_BREAKS.sub("\n", content))
+        # astral characters are rare (emoji), check them one by one
+        return ASTRAL_CHARACTERS.sub(lambda m: "".join(c for c in m.group() if c.isprintable()), content)
+
+    def openCsvFile(self, filePath, start=None, end=None):
+        archivePath, memberName = self.getArchiveMember(filePath)
+        if memberName != None:
+            # the member stays readable once the archive is closed
+            with zipfile.ZipFile(archivePath) as archive:
+                return io.TextIOWrapper(archive.open(memberName), newline='')
+        if filePath.endswith(".gz"):
+            return io.TextIOWrapper(gzip.open(filePath), newline='')
+        if filePath.endswith((".zst", ".zstd")):
+            if zstandard == None:
+                raise Exception("the zstandard module is required to read " + filePath)
+            reader = zstandard.ZstdDecompressor().stream_reader(open(filePath, 'rb'), read_across_frames=True, closefd=True)
+            return io.TextIOWrapper(reader, newline='')
+        if start == None:
+            return open(filePath, newline='')
+        # text stream over the byte range [start, end) of the file
+        fp = open(filePath, 'rb')
+        fp.seek(start)
+        return io.TextIOWrapper(io.BufferedReader(_FileRange(fp, end - start)), newline='')
+
+    def readCsvText(self, filePath, start=None, end=None):
+        # stream the file in chunks, memory doesn't depend on file size
+        with self.openCsvFile(filePath, start, end) as fp:
+            while True:
+                with self.timings.stage("read"):
+                    chunk = fp.read(self.readChunkSize)
+                if not chunk:
+                    break
+                with self.timings.stage("sanitize"):
+                    chunk = self.makeItPrintable(chunk)
+                yield chunk
+
+    def readCsvLines(self, filePath, start=None, end=None):
+        pending = []
+        for chunk in self.readCsvText(filePath, start, end):
+            pending.append(chunk)
+            # a line longer than a chunk is joined once it ends, not once per chunk
+            if not "\n" in chunk and not "\r" in chunk:
+                continue
+            lines = "".join(pending).splitlines(keepends=True)
+            # the last line may continue in the next chunk (or be a \r of \r\n)
+            pending = [] if lines[-1].endswith("\n") else [lines.pop()]
+            yield from lines
+        if pending:
+            yield "".join(pending)
+
+    def readCsvBatches(self, filePath, fieldNames, start=None, end=None):
+        # the sanitized text of readCsvText parsed in Arrow record batches of
+        # string columns, empty values stay empty strings like in csv rows
+        readOptions = pyarrow.csv.ReadOptions(column_names=fieldNames, skip_rows=0 if start != None else 1, block_size=self.arrowBlockSize)
+        parseOptions = pyarrow.csv.ParseOptions(newlines_in_values=True)
+        convertOptions = pyarrow.csv.ConvertOptions(column_types=dict((fieldName, pyarrow.string()) for fieldName in fieldNames),
+            strings_can_be_null=False, quoted_strings_can_be_null=False)
+        stream = io.BufferedReader(_TextStream(self.readCsvText(filePath, start, end)), self.readChunkSize)
+        rows = 0
+        try:
+            for batch in pyarrow.csv.open_csv(stream, read_options=readOptions, parse_options=parseOptions, convert_options=convertOptions):
+                rows += batch.num_rows
+                yield batch
+        except pyarrow.ArrowInvalid as e:
+            # rows with fewer or more values than the header, a block fails as a whole
+            logger.warning(' %s: %s, reading the rest with the csv module', filePath, str(e).splitlines()[0])
+            yield from self.readCsvRowBatches(filePath, fieldNames, start, end, rows)
+
+    def readCsvRowBatches(self, filePath, fieldNames, start, end, skip):
+        # the batches of readCsvBatches after its first skip rows, parsed by the
+        # csv module, short rows are padded and long ones cut like in encodeRows
+        csvData = csv.reader(self.readCsvLines(filePath, start, end))
+        if start == None:
+            next(csvData, None)
+        csvData = itertools.islice(filter(None, csvData), skip, None)
+        width = len(fieldNames)
+        while True:
+            rows = [row[:width] + [""] * (width - len(row)) for row in itertools.islice(csvData, self.arrowFallbackRows)]
+            if not rows:
+                return
+            yield pyarrow.RecordBatch.from_arrays([pyarrow.array(column, pyarrow.string()) for column in zip(*rows)], names=fieldNames)
 
     def escapeString(self, value):
         if value == "" or value == None:
@@ -58,11 +918,11 @@ class Salesforce_to_PostgreSQL:
         value = (str('"') + str(value) + str('"'))
         return value
 
-    def insertData(self, tableName,fileContent,fields):
+    def insertData(self, tableName,filePath,fields):
         
         logger.debug(' inserting data of %s', tableName)
         
-        csvData = csv.DictReader(io.StringIO(fileContent))
+        csvData = csv.DictReader(self.readCsvLines(filePath))
         i = 0
         
         for row in csvData:
@@ -112,129 +972,594 @@ class Salesforce_to_PostgreSQL:
                     break
             i+=1
 
-    def insertDataBulk(self, tableName, fileContent, fields):
+    def insertDataBulk(self, tableName, filePath, fields):
         
         logger.debug(' inserting data of %s', tableName)
         
-        csvData = csv.DictReader(io.StringIO(fileContent))
-        i = 0
-        sqlIns = "INSERT INTO " + self.quoteTableOrColumn(tableName) + " "
-        sqlColsM = ""
-        sqlValsM = ""
-            
+        csvData = csv.reader(self.readCsvLines(filePath))
+        fieldNames = next(csvData)
+        plan = self.getRowPlan(fieldNames, fields, SQL_CONVERTERS)
+
+        sqlCols = "Id,sfId"
+        for fieldName in fieldNames:
+            if fieldName != "Id":
+                sqlCols += ", " + self.quoteTableOrColumn(fieldName)
+        sqlIns = "INSERT INTO " + self.quoteTableOrColumn(tableName) + " (" + sqlCols + ") VALUES "
+
+        quarantine = None
+        if args["quarantine_dir"]:
+            quarantine = _Quarantine(self.getQuarantinePath(tableName), filePath, None, fieldNames, list(fields))
+            csvData = self.numberRows(csvData)
+        else:
+            # blank lines are no rows, like for the DictReader of analyzeRows
+            csvData = filter(None, csvData)
+
+        # ids are collected from the skipped rows too, a resumed load saves all of them
+        relations = None
+        if args["relations"]:
+            relations = _IdCollector(self.getRelationsPath(tableName), filePath, None, fieldNames, fields, self.timings)
+            csvData = relations.collect(csvData, quarantine != None)
+
+        # rows committed before an interrupted run are skipped
+        committed = self.getCommittedRows(filePath)
+        if committed > 0:
+            logger.info(' skipping %s rows already in %s', committed, tableName)
+        csvData = itertools.islice(csvData, committed, None)
+        if args["test_data"] != None:
+            csvData = itertools.islice(csvData, args["test_data"])
+
+        batchRows = args["batch_rows"] or self.insertBatchRows
+        batchSize = args["batch_size"] * 1024 * 1024
+        stats = self.newLoadStats()
+        sqlVals = []
+        size = 0
+        encode = lambda rows: self.encodeRows(rows, plan, len(fieldNames), "(", ", ", ")")
+        rows = encode(csvData) if quarantine == None else quarantine.encode(csvData, encode)
+        if args["engine"] == "pipeline":
+            rows = self.pipelineRows(rows)
+        for values in rows:
+            sqlVals.append(values)
+            size += len(values)
+
+            if len(sqlVals) >= batchRows or size >= batchSize:
+                self.insertBatch(sqlIns, sqlVals, stats, quarantine)
+                self.endBatch(filePath, None, committed, stats, quarantine)
+                sqlVals = []
+                size = 0
+
+        if len(sqlVals) > 0:
+            self.insertBatch(sqlIns, sqlVals, stats, quarantine)
+        self.endLoad(tableName, filePath, None, committed, stats, quarantine)
+        if relations != None:
+            relations.save()
+        return stats
+
+    def newLoadStats(self):
+        # pending counts the batches not committed yet, quarantined the rejected rows
+        return {"rows": 0, "batches": 0, "commits": 0, "size": 0, "pending": 0, "quarantined": 0}
+
+    def beginBatch(self, stats):
+        if stats["pending"] == 0:
+            with self.timings.stage("database"):
+                self.executeSql("BEGIN")
+
+    def endBatch(self, filePath, start, committed, stats, quarantine=None):
+        # commit every --commit-batches batches, or once per file
+        if not args["single_transaction"] and stats["pending"] >= args["commit_batches"]:
+            self.commitLoad(filePath, start, committed, stats, quarantine)
+
+    def commitLoad(self, filePath, start, committed, stats, quarantine=None):
+        with self.timings.stage("database"):
+            self.executeSql("COMMIT")
+        stats["commits"] += 1
+        stats["pending"] = 0
+        if quarantine != None:
+            quarantine.flush(stats["rows"] + stats["quarantined"])
+        # rejected rows are skipped on resume like the loaded ones
+        self.writeJournal({"file": filePath, "chunk": start, "committed": committed + stats["rows"] + stats["quarantined"]})
+
+    def endLoad(self, tableName, filePath, start, committed, stats, quarantine=None):
+        if quarantine != None:
+            # rows rejected by their converters after the last batch
+            stats["quarantined"] = quarantine.rejected
+        if stats["pending"] > 0:
+            self.commitLoad(filePath, start, committed, stats, quarantine)
+        elif quarantine != None and quarantine.flush(stats["quarantined"]) > 0:
+            # rows rejected by their converters after the last commit are done too
+            self.writeJournal({"file": filePath, "chunk": start, "committed": committed + stats["rows"] + stats["quarantined"]})
+        self.logLoadStats(tableName, stats)
+
+    def logLoadStats(self, tableName, stats):
+        batches = max(stats["batches"], 1)
+        logger.info(' %s: %s rows in %s batches (%.0f rows, %.1f KB per batch), %s commits', tableName,
+            stats["rows"], stats["batches"], stats["rows"] / batches, stats["size"] / batches / 1024, stats["commits"])
+        if stats["quarantined"] > 0:
+            logger.warning(' %s: %s rows quarantined', tableName, stats["quarantined"])
+
+    def numberRows(self, csvData):
+        # (line, row) with the line each record starts on, in the file or chunk
+        line = csvData.line_num
         for row in csvData:
-            
-            sqlCols = "(Id,sfId, "
-            id = self.getSqlId(row["Id"])
-            
-            sqlVals = "(" + str(id) + ", '"+row["Id"]+ "', "
-            for fieldName in csvData.fieldnames:
-                if fieldName != "Id":
-                    sqlCols += "" + self.quoteTableOrColumn(fieldName) + ", "
-                    value = row[fieldName]
-                    if value == "" or value == None:
-                        value = "NULL"
-                    
-                    nonAposTypes = ["int","bool","float"]
-                    
-                    if value == "NULL" or fields[fieldName]["type"] in nonAposTypes:
-                        sqlVals += value
-                    else:
-                        if fields[fieldName]["type"]=="id":
-                            sqlVals += str(self.getSqlId(value))
-                        elif fields[fieldName]["type"]=="datetime":
-                            sqlVals += "'" + self.escapeString(value[:19]).decode("utf-8") + "'"
-                        else:
-                            v = unicodedata.normalize('NFKD', value).encode('ascii','ignore')
-                            sqlVals += "'" + self.escapeString(v).decode("utf-8") + "'"
-                    sqlVals += ", "
-                
-            if sqlColsM == "":
-                sqlColsM=sqlCols[:-2] + ")"
+            # blank lines are skipped, they still count as lines
+            if row:
+                yield line + 1, row
+            line = csvData.line_num
 
-            sqlValsM += sqlVals[:-2] + "),"
+    def getQuarantinePath(self, tableName):
+        return os.path.join(args["quarantine_dir"], tableName + ".csv")
 
-            i += 1
+    def resetQuarantine(self, tableName, fields):
+        # rows rejected by an earlier load of the table are gone with it
+        os.makedirs(args["quarantine_dir"], exist_ok=True)
+        with open(self.getQuarantinePath(tableName), "w", newline='') as fp:
+            csv.writer(fp).writerow(["file", "chunk", "line", "error"] + list(fields))
 
-            if i % 100 == 0:
-                sql = sqlIns + sqlColsM + " VALUES " + sqlValsM[:-1] + ";"
-                #logger.debug("sql in loop")
-                #logger.debug(sql)
+    def countQuarantined(self, tableName):
+        if not args["quarantine_dir"] or not os.path.isfile(self.getQuarantinePath(tableName)):
+            return 0
+        with open(self.getQuarantinePath(tableName), newline='') as fp:
+            return sum(1 for row in csv.reader(fp)) - 1
+
+    def getRelationsPath(self, tableName):
+        return os.path.join(args["relations"], tableName)
+
+    def resetRelations(self, tableName):
+        # ids of an earlier load of the table are gone with it
+        shutil.rmtree(self.getRelationsPath(tableName), ignore_errors=True)
+
+    def publishRelations(self, loadTable, tableName):
+        # the ids of a swapped in table replace those of the table
+        if os.path.isdir(self.getRelationsPath(loadTable)):
+            shutil.rmtree(self.getRelationsPath(tableName), ignore_errors=True)
+            os.replace(self.getRelationsPath(loadTable), self.getRelationsPath(tableName))
+
+    def dropReferencingKeys(self, tableName):
+        sql = "SELECT conrelid::regclass::text, conname FROM pg_constraint WHERE contype = 'f' AND confrelid = to_regclass(%s)"
+        cursor = self.executeSql(sql, (self.quoteTableOrColumn(tableName),))
+        for referencingTable, constraintName in cursor.fetchall():
+            # parallel jobs may drop the referencing table meanwhile
+            self.executeSql("ALTER TABLE IF EXISTS " + referencingTable + " DROP CONSTRAINT IF EXISTS " + self.quoteTableOrColumn(constraintName))
+
+    def getRelationFiles(self):
+        # (table, column, prefix) -> id files of every file or chunk loaded
+        files = {}
+        directory = args["relations"]
+        for tableName in sorted(os.listdir(directory)):
+            path = os.path.join(directory, tableName)
+            if not os.path.isdir(path) or tableName.endswith(("__shadow", "__staging")):
+                continue
+            for fileName in sorted(os.listdir(path)):
+                parts = fileName.split(".")
+                if len(parts) == 4 and parts[3] == "q":
+                    files.setdefault((tableName, parts[1], parts[2]), []).append(os.path.join(path, fileName))
+        return files
+
+    def resolveRelations(self):
+        # the first 3 characters of an id, its key prefix, name the object it belongs to
+        started = time.perf_counter()
+        os.makedirs(args["relations"], exist_ok=True)
+        files = self.getRelationFiles()
+
+        objects = {}
+        for tableName, fieldName, prefix in files:
+            if fieldName == "Id":
+                if prefix in objects:
+                    logger.warning('%s and %s both hold %s ids, lookups resolve to %s', objects[prefix], tableName, prefix, objects[prefix])
+                    continue
+                objects[prefix] = tableName
+
+        # orphans are counted against the sorted ids of the target, no join in the database
+        relations = []
+        targetIds = {}
+        for tableName, fieldName, prefix in files:
+            if fieldName == "Id":
+                continue
+            values = readIds(files[(tableName, fieldName, prefix)])
+            target = objects.get(prefix)
+            orphans = None
+            if target != None:
+                if not target in targetIds:
+                    targetIds[target] = readIds(files[(target, "Id", prefix)], merge=True)
+                orphans = countMissingIds(targetIds[target], values)
+            relations.append({"table": tableName, "column": fieldName, "prefix": prefix, "target": target,
+                "references": len(values), "orphans": orphans})
+
+        lookups = {}
+        for relation in relations:
+            lookups.setdefault((relation["table"], relation["column"]), []).append(relation)
+            if relation["target"] == None:
+                logger.info(' %s.%s: %s references to %s ids, no table holds them', relation["table"], relation["column"],
+                    relation["references"], relation["prefix"])
+            elif relation["orphans"] > 0:
+                logger.warning(' %s.%s: %s of %s references to %s are orphans', relation["table"], relation["column"],
+                    relation["orphans"], relation["references"], relation["target"])
+
+        keys = 0
+        for (tableName, fieldName), targets in lookups.items():
+            resolved = sorted(set(relation["target"] for relation in targets if relation["target"] != None))
+            if len(resolved) == 0 or not self.tableExists(tableName):
+                continue
+            quotedTable = self.quoteTableOrColumn(tableName)
+            # same name as the index of --index-ids
+            self.executeSql("CREATE INDEX IF NOT EXISTS " + self.quoteTableOrColumn(tableName + "_" + fieldName + "_idx") + " ON " + quotedTable + " (" + self.quoteTableOrColumn(fieldName) + ")")
+
+            # polymorphic lookups point to several tables and can't have a key
+            if args["foreign_keys"] and len(resolved) == 1 and self.tableExists(resolved[0]):
+                constraintName = self.quoteTableOrColumn(tableName + "_" + fieldName + "_fkey")
+                self.executeSql("ALTER TABLE " + quotedTable + " DROP CONSTRAINT IF EXISTS " + constraintName)
+                sql = "ALTER TABLE " + quotedTable + " ADD CONSTRAINT " + constraintName + " FOREIGN KEY (" + self.quoteTableOrColumn(fieldName) + ") REFERENCES " + self.quoteTableOrColumn(resolved[0]) + " (id)"
+                # the rows in the table aren't checked when some are known to fail
+                if any(relation["target"] == None or relation["orphans"] > 0 for relation in targets):
+                    sql += " NOT VALID"
+                self.executeSql(sql)
+                keys += 1
+
+        with open(os.path.join(args["relations"], "relations.json"), "w") as fp:
+            json.dump({"objects": objects, "relations": relations}, fp, indent=2)
+        logger.info('relations: %s lookup columns of %s objects, %s resolved, %s foreign keys, %s orphans, in %.1fs', len(lookups), len(objects),
+            sum(1 for targets in lookups.values() if any(relation["target"] != None for relation in targets)), keys,
+            sum(relation["orphans"] for relation in relations if relation["target"] != None), time.perf_counter() - started)
+
+    def sendQuarantined(self, send, lines, stats, quarantine):
+        self.beginBatch(stats)
+        sources = [quarantine.pending.popleft() for line in lines]
+        with self.timings.stage("database"):
+            loaded = self.sendBisected(send, lines, sources, quarantine)
+
+        stats["rows"] += loaded
+        stats["batches"] += 1
+        stats["pending"] += 1
+        stats["size"] += sum(map(len, lines))
+        # every row up to the last one of the batch is either loaded or rejected
+        stats["quarantined"] = sources[-1][0] + 1 - stats["rows"]
+
+        if args["max_error_rate"] != None and stats["quarantined"] > args["max_error_rate"] * (stats["rows"] + stats["quarantined"]):
+            self.executeSql("ROLLBACK")
+            raise Exception("%s of %s rows rejected, above --max-error-rate" % (stats["quarantined"], stats["rows"] + stats["quarantined"]))
+
+    def sendBisected(self, send, lines, sources, quarantine):
+        # a failed batch is split in halves until the bad rows are alone
+        self.executeSql("SAVEPOINT batch")
+        try:
+            send(lines)
+        except psycopg2.Error as e:
+            self.executeSql("ROLLBACK TO SAVEPOINT batch; RELEASE SAVEPOINT batch")
+            if len(lines) == 1:
+                quarantine.reject(sources[0], e)
+                return 0
+            middle = len(lines) // 2
+            return (self.sendBisected(send, lines[:middle], sources[:middle], quarantine)
+                + self.sendBisected(send, lines[middle:], sources[middle:], quarantine))
+        self.executeSql("RELEASE SAVEPOINT batch")
+        return len(lines)
+
+    def insertBatch(self, sqlIns, sqlVals, stats, quarantine=None):
+        if quarantine != None:
+            self.sendQuarantined(lambda lines: self._database.cursor().execute(sqlIns + ",".join(lines) + ";"), sqlVals, stats, quarantine)
+            return
+
+        self.beginBatch(stats)
+        sql = sqlIns + ",".join(sqlVals) + ";"
+        try:
+            cursor = self._database.cursor()
+            with self.timings.stage("database"):
+                cursor.execute(sql)
+        except (Exception) as e:
+            logger.debug(sql)
+            logger.error('SQL error : %s', e)
+
+            logger.error("Stack trace: ")
+            traceback.print_tb(sys.exc_info()[2])
+
+            sys.exit(-1)
+
+        stats["rows"] += len(sqlVals)
+        stats["batches"] += 1
+        stats["pending"] += 1
+        stats["size"] += len(sql)
+
+    def getRowPlan(self, fieldNames, fields, converters):
+        # one converter per output column, bound to its position in the csv row
+        normalizeColumns = None
+        if args["normalize_columns"] != "*":
+            normalizeColumns = [fieldName.strip() for fieldName in args["normalize_columns"].split(",")]
+
+        plan = [(fieldNames.index("Id"), converters["primary"])]
+        for index, fieldName in enumerate(fieldNames):
+            if fieldName != "Id":
+                fieldType = fields[fieldName]["type"]
+                if fieldType == "string" and (normalizeColumns == None or fieldName in normalizeColumns):
+                    fieldType = "ascii"
+                plan.append((index, converters.get(fieldType, converters["string"])))
+        return tuple(plan)
+
+    def encodeRows(self, rows, plan, width, prefix, separator, suffix):
+        for row in rows:
+            if not row:
+                continue
+            if len(row) < width:
+                row += [""] * (width - len(row))
+            yield prefix + separator.join([convert(row[index]) for index, convert in plan]) + suffix
+
+    def useArrowEngine(self):
+        # without pyarrow --engine arrow runs like sync
+        return args["engine"] == "arrow" and pyarrow != None
+
+    def encodeBatches(self, batches, plan):
+        # the lines of encodeRows, a record batch at a time
+        for batch in batches:
+            columns = []
+            for index, convert in plan:
+                values = batch.column(index)
+                if convert in ARROW_ID_CONVERTERS:
+                    with self.timings.stage("ids"):
+                        columns.append(ARROW_CONVERTERS[convert](values))
+                elif convert in ARROW_CONVERTERS:
+                    columns.append(ARROW_CONVERTERS[convert](values))
+                else:
+                    columns.append(pyarrow.array([convert(value) for value in values.to_pylist()], pyarrow.string()))
+            lines = pyarrow.compute.binary_join_element_wise(*columns, "\t")
+            yield from pyarrow.compute.binary_join_element_wise(lines, "", "\n").to_pylist()
+
+    def encodeBinaryRows(self, rows, plan, width):
+        # rows are built in one reused buffer, the primary id fills two columns
+        buffer = bytearray()
+        fieldCount = BINARY_FIELD_COUNT.pack(len(plan) + 1)
+        for row in rows:
+            if not row:
+                continue
+            if len(row) < width:
+                row += [""] * (width - len(row))
+            del buffer[:]
+            buffer += fieldCount
+            for index, convert in plan:
+                convert(buffer, row[index])
+            yield bytes(buffer)
+
+    def pipelineRows(self, rows):
+        # reading, parsing and encoding run in a thread while the caller waits on
+        # the database, at most pipeline_queue blocks of rows are held in between
+        blocks = queue.Queue(maxsize=args["pipeline_queue"])
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
                 try:
-                    cursor = self._database.cursor()
-                    cursor.execute(sql)   
-                    self._database.commit() 
-                except (Exception) as e:
-                    logger.debug(sql)
-                    logger.error('error : %s', e)
-                    
-                    logger.error("Stack trace: ")
-                    traceback.print_tb(sys.exc_info()[2])
+                    blocks.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
 
-                    sys.exit(-1)
-                sqlValsM = ""
+        def produce():
+            try:
+                with self.timings.stage("encode"):
+                    while True:
+                        block = []
+                        size = 0
+                        for row in itertools.islice(rows, self.pipelineBlockRows):
+                            block.append(row)
+                            size += len(row)
+                            if size >= self.pipelineBlockSize:
+                                break
+                        if not put(block) or not block:
+                            return
+            except BaseException as e:
+                put(e)
 
-            if args["test_data"] != None:
-                if i >= args["test_data"]:
+        producer = threading.Thread(target=produce, name="pipeline-producer", daemon=True)
+        producer.start()
+        try:
+            while True:
+                block = blocks.get()
+                if isinstance(block, BaseException):
+                    raise block
+                if not block:
                     break
-            
-        if i % 100 > 1:
-            sql = sqlIns + sqlColsM +" VALUES " + sqlValsM[:-1]+";"
-            #logger.debug("sql after loop")
-            #logger.debug(sql)
+                yield from block
+        finally:
+            # the consumer may stop early, on an error or sys.exit
+            stop.set()
+            producer.join()
+
+    def copyDataBulk(self, tableName, filePath, fields, start=None, end=None):
+
+        logger.debug(' copying data of %s', tableName)
+
+        # base64 columns are sent as their bytes, their text COPY hex would copy them several times
+        binary = args["copy_format"] == "binary" or any(field["type"] == "base64" for field in fields.values())
+        # --engine arrow converts text COPY rows a record batch at a time,
+        # quarantined loads send their rows one by one
+        arrow = self.useArrowEngine() and not binary and not args["quarantine_dir"]
+        if arrow:
+            fieldNames = self.readCsvHeader(filePath) if start == None else list(fields)
+            csvData = self.readCsvBatches(filePath, fieldNames, start, end)
+        elif start == None:
+            csvData = csv.reader(self.readCsvLines(filePath))
+            fieldNames = next(csvData)
+        else:
+            # a chunk of the file has no header line
+            csvData = csv.reader(self.readCsvLines(filePath, start, end))
+            fieldNames = list(fields)
+        plan = self.getRowPlan(fieldNames, fields, BINARY_CONVERTERS if binary else COPY_CONVERTERS)
+
+        quarantine = None
+        if args["quarantine_dir"]:
+            quarantine = _Quarantine(self.getQuarantinePath(tableName), filePath, start, fieldNames, list(fields))
+            csvData = self.numberRows(csvData)
+        elif not arrow:
+            # blank lines are no rows, like for the DictReader of analyzeRows
+            csvData = filter(None, csvData)
+
+        # ids are collected from the skipped rows too, a resumed load saves all of them
+        relations = None
+        if args["relations"]:
+            relations = _IdCollector(self.getRelationsPath(tableName), filePath, start, fieldNames, fields, self.timings)
+
+        # rows committed before an interrupted run are skipped
+        committed = self.getCommittedRows(filePath, start)
+        if committed > 0:
+            logger.info(' skipping %s rows already in %s', committed, tableName)
+        if arrow:
+            if args["test_data"] != None:
+                csvData = sliceBatches(csvData, 0, committed + args["test_data"])
+            if relations != None:
+                csvData = relations.collectBatches(csvData)
+            csvData = sliceBatches(csvData, committed)
+        else:
+            if relations != None:
+                csvData = relations.collect(csvData, quarantine != None)
+            if committed > 0:
+                csvData = itertools.islice(csvData, committed, None)
+            if args["test_data"] != None:
+                csvData = itertools.islice(csvData, args["test_data"])
+
+        sqlCols = "Id,sfId"
+        for fieldName in fieldNames:
+            if fieldName != "Id":
+                sqlCols += ", " + self.quoteTableOrColumn(fieldName)
+        sql = "COPY " + self.quoteTableOrColumn(tableName) + " (" + sqlCols + ") FROM STDIN"
+
+        header, trailer = "", ""
+        if binary:
+            sql += " (FORMAT binary)"
+            header, trailer = BINARY_COPY_HEADER, BINARY_COPY_TRAILER
+            encode = lambda rows: self.encodeBinaryRows(rows, plan, len(fieldNames))
+        else:
+            encode = lambda rows: self.encodeRows(rows, plan, len(fieldNames), "", "\t", "\n")
+        if arrow:
+            rows = self.encodeBatches(csvData, plan)
+        elif quarantine == None:
+            rows = encode(csvData)
+        else:
+            rows = quarantine.encode(csvData, encode)
+        if args["engine"] == "pipeline":
+            rows = self.pipelineRows(rows)
+        batchRows = args["batch_rows"] or self.copyBatchRows
+        batchSize = args["batch_size"] * 1024 * 1024
+        stats = self.newLoadStats()
+        while True:
+            # no empty COPY once the rows run out
+            first = next(rows, None)
+            if first == None:
+                break
+            if quarantine != None:
+                # the batch is kept until it is in, failed batches are bisected
+                lines = [first]
+                size = len(first)
+                for line in itertools.islice(rows, batchRows - 1):
+                    lines.append(line)
+                    size += len(line)
+                    if size >= batchSize:
+                        break
+                send = lambda lines: self._database.cursor().copy_expert(sql, _CopyStream(iter(lines), len(lines), sys.maxsize, header, trailer), size=65536)
+                self.sendQuarantined(send, lines, stats, quarantine)
+                self.endBatch(filePath, start, committed, stats, quarantine)
+                continue
+            self.beginBatch(stats)
+            stream = _CopyStream(itertools.chain([first], rows), batchRows, batchSize, header, trailer, self.timings)
             try:
                 cursor = self._database.cursor()
-                cursor.execute(sql)    
-                self._database.commit()
+                with self.timings.stage("database"):
+                    cursor.copy_expert(sql, stream, size=65536)
             except (Exception) as e:
                 logger.debug(sql)
-                logger.error('SQL error : %s', e)
-                
+                logger.error('COPY error : %s', e)
+
                 logger.error("Stack trace: ")
                 traceback.print_tb(sys.exc_info()[2])
 
-                sys.exit(-1)
-        
-    def createSqlTable(self, filePath, fields):
-        tableName = os.path.splitext(os.path.basename(filePath))[0]
+                sys.exit(-1)
+            stats["rows"] += stream.rowCount
+            stats["batches"] += 1
+            stats["pending"] += 1
+            stats["size"] += stream.size
+            self.endBatch(filePath, start, committed, stats, quarantine)
+
+        self.endLoad(tableName, filePath, start, committed, stats, quarantine)
+        if relations != None:
+            relations.save()
+        return stats
+
+    def getTableName(self, filePath):
+        return os.path.splitext(self.getMemberName(filePath))[0]
+
+    def getArchiveMember(self, filePath):
+        # (archive, member) of a zip member path, (filePath, None) otherwise
+        archivePath, separator, memberName = filePath.partition(ARCHIVE_MEMBER_SEPARATOR)
+        if separator and archivePath.lower().endswith(".zip"):
+            return archivePath, memberName
+        return filePath, None
+
+    def getMemberName(self, filePath):
+        # name of the csv file inside its archive or compressed file
+        archivePath, memberName = self.getArchiveMember(filePath)
+        if memberName != None:
+            return os.path.basename(memberName)
+        fileName = os.path.basename(filePath)
+        if fileName.endswith(COMPRESSED_SUFFIXES):
+            fileName = os.path.splitext(fileName)[0]
+        return fileName
+
+    def isArchiveSource(self, filePath):
+        return self.getArchiveMember(filePath)[1] != None or filePath.endswith(COMPRESSED_SUFFIXES)
+
+    def sourceExists(self, filePath):
+        archivePath, memberName = self.getArchiveMember(filePath)
+        if memberName == None:
+            return os.path.isfile(filePath)
+        if not os.path.isfile(archivePath):
+            return False
+        with zipfile.ZipFile(archivePath) as archive:
+            return memberName in archive.namelist()
+
+    def getSourceSize(self, filePath):
+        # uncompressed size of zip members, compressed size of gzip and zstd files
+        archivePath, memberName = self.getArchiveMember(filePath)
+        if memberName == None:
+            return os.path.getsize(filePath)
+        with zipfile.ZipFile(archivePath) as archive:
+            return archive.getinfo(memberName).file_size
+
+    def listArchive(self, archivePath):
+        if not archivePath.lower().endswith(".zip"):
+            return [archivePath]
+        with zipfile.ZipFile(archivePath) as archive:
+            return [archivePath + ARCHIVE_MEMBER_SEPARATOR + info.filename for info in archive.infolist()
+                if not info.is_dir() and info.filename[-3:] == "csv"]
+
+    def createSqlTable(self, filePath, fields, tableName=None):
+        if tableName == None:
+            tableName = self.getTableName(filePath)
         
         logger.debug(' generating sql create table for : %s', tableName)
+        if args["foreign_keys"]:
+            # keys of other tables referencing this one are added again by resolveRelations
+            self.dropReferencingKeys(tableName)
         sql = "DROP TABLE IF EXISTS " + self.quoteTableOrColumn(tableName) + ";"
         cursor = self._database.cursor()
         cursor.execute(sql)
+        if args["quarantine_dir"]:
+            self.resetQuarantine(tableName, fields)
+        if args["relations"]:
+            self.resetRelations(tableName)
 
-        sql = "CREATE TABLE " + self.quoteTableOrColumn(tableName) + " ("
+        # fast loads fill an unlogged table and add the primary key afterwards
+        if args["fast_load"]:
+            sql = "CREATE UNLOGGED TABLE " + self.quoteTableOrColumn(tableName) + " ("
+        else:
+            sql = "CREATE TABLE " + self.quoteTableOrColumn(tableName) + " ("
         sql += "id BIGSERIAL, "
         sql += "sfId varchar(18) NULL, "
 
         for key in fields:
             if key != "Id":
-                sql += self.quoteTableOrColumn(key)
-                if fields[key]["type"] == "string":
-                    if fields[key]["size"] < 255:
-                        sql += " varchar(255) NULL, "
-                    else:
-                        sql += " text NULL, "
-
-                if fields[key]["type"] == "int":
-                    sql += " bigint NULL, "
-
-                if fields[key]["type"] == "id":
-                    sql += " bigint NULL, "
-
-                if fields[key]["type"] == "datetime":
-                    if args["database"].lower() == "mysql":
-                        sql += " datetime NULL, "
-                    else:
-                        sql += " timestamp NULL, "
-
-                if fields[key]["type"] == "bool":
-                    sql += " tinyint NULL, "
+                sql += self.quoteTableOrColumn(key) + " " + self.getSqlColumnType(fields[key]) + " NULL, "
                 
-                if fields[key]["type"] == "float":
-                    sql += " decimal(15,2) NULL, "
-                
-        sql += "PRIMARY KEY (Id)"
+        if args["fast_load"]:
+            sql = sql[:-2]
+        else:
+            sql += "PRIMARY KEY (Id)"
         if args["database"].lower() == "mysql":
             sql += ") DEFAULT CHARSET=utf8;"
         else:
@@ -257,44 +1582,254 @@ class Salesforce_to_PostgreSQL:
         
         return tableName
 
+    def getSqlColumnType(self, field):
+        if field["type"] == "string":
+            if field["size"] < 255:
+                return "varchar(255)"
+            return "text"
+
+        if field["type"] == "int":
+            return "bigint"
+
+        if field["type"] == "id":
+            return "bigint"
+
+        if field["type"] == "datetime":
+            if args["database"].lower() == "mysql":
+                return "datetime"
+            return "timestamp"
+
+        if field["type"] == "bool":
+            return "tinyint"
+
+        if field["type"] == "float":
+            return "decimal(15,2)"
+
+        if field["type"] == "base64":
+            if args["database"].lower() == "mysql":
+                return "longblob"
+            return "bytea"
+
+    def executeSql(self, sql, params=None):
+        try:
+            logger.debug(sql)
+            cursor = self._database.cursor()
+            cursor.execute(sql, params)
+            return cursor
+        except (Exception) as e:
+            logger.error(sql)
+            logger.error('error : %s', e)
+
+            logger.error("Stack trace: ")
+            traceback.print_tb(sys.exc_info()[2])
+
+            sys.exit(-1)
+
+    def tableExists(self, tableName):
+        cursor = self.executeSql("SELECT to_regclass(%s)", (self.quoteTableOrColumn(tableName),))
+        return cursor.fetchone()[0] != None
+
+    def hasPrimaryKey(self, tableName):
+        cursor = self.executeSql("SELECT COUNT(*) FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p'", (self.quoteTableOrColumn(tableName),))
+        return cursor.fetchone()[0] > 0
+
+    def getTableColumns(self, tableName):
+        # column -> field of its type, text has no size limit
+        cursor = self.executeSql("SELECT column_name, data_type, character_maximum_length FROM information_schema.columns WHERE table_name = %s", (tableName,))
+        return {row[0]: {"type": COLUMN_FIELD_TYPES.get(row[1], "string"), "size": row[2] or sys.maxsize} for row in cursor.fetchall()}
+
+    def getWidenedField(self, column, field):
+        # the field a column of an earlier import becomes to hold the new values,
+        # None if it holds them already, any value can be stored as a string
+        if column["type"] == "string":
+            if field["type"] == "base64":
+                # bytes are merged into a string column as base64 text, see mergeStagingTable
+                field = dict(field, type="string")
+            return field if field["type"] == "string" and field["size"] > column["size"] else None
+        # ids are stored as bigint like ints
+        fieldType = "int" if field["type"] == "id" else field["type"]
+        widenedType = self.promoteFieldType(column["type"], fieldType)
+        if widenedType == column["type"]:
+            return None
+        # a column without a length becomes text, its old values may be longer than the new ones
+        return dict(field, type=widenedType, size=max(field["size"], column["size"]))
+
+    def mergeStagingTable(self, stagingTable, tableName, fields, deleteMissing):
+        quotedTable = self.quoteTableOrColumn(tableName)
+
+        if not self.tableExists(tableName):
+            # first import, the staging table becomes the table
+            logger.info(' %s does not exist yet, keeping the whole load', tableName)
+            self.executeSql("ALTER TABLE " + self.quoteTableOrColumn(stagingTable) + " RENAME TO " + quotedTable)
+            self.renameTableIndexes(stagingTable, tableName)
+            if args["fast_load"]:
+                self.executeSql("ALTER TABLE " + quotedTable + " SET LOGGED")
+            self.executeSql("CREATE UNIQUE INDEX " + self.quoteTableOrColumn(tableName + "_sfid_key") + " ON " + quotedTable + " (sfId)")
+            return
+
+        self.executeSql("CREATE UNIQUE INDEX IF NOT EXISTS " + self.quoteTableOrColumn(tableName + "_sfid_key") + " ON " + quotedTable + " (sfId)")
+
+        # columns added to the object since the last import
+        columns = self.getTableColumns(tableName)
+        for fieldName in fields:
+            if fieldName != "Id" and not fieldName in columns:
+                logger.info(' adding column %s to %s', fieldName, tableName)
+                self.executeSql("ALTER TABLE " + quotedTable + " ADD COLUMN " + self.quoteTableOrColumn(fieldName) + " " + self.getSqlColumnType(fields[fieldName]) + " NULL")
+
+        # columns whose new values don't fit their type any more, e.g. an int column with decimals
+        for fieldName in fields:
+            if fieldName == "Id" or not fieldName in columns:
+                continue
+            widened = self.getWidenedField(columns[fieldName], fields[fieldName])
+            if widened == None:
+                continue
+            columnType = self.getSqlColumnType(widened)
+            column = self.quoteTableOrColumn(fieldName)
+            logger.info(' widening column %s of %s to %s', fieldName, tableName, columnType)
+            # bytea would be cast to hex, the new rows hold base64 like the export
+            using = "translate(encode(" + column + ", 'base64'), E'\\n', '')" if columns[fieldName]["type"] == "base64" else column + "::" + columnType
+            self.executeSql("ALTER TABLE " + quotedTable + " ALTER COLUMN " + column + " TYPE " + columnType + " USING " + using)
+
+        sqlCols = ["id", "sfId"]
+        sqlValues = ["id", "sfId"]
+        sqlUpdates = []
+        for fieldName in fields:
+            if fieldName != "Id":
+                column = self.quoteTableOrColumn(fieldName)
+                sqlCols.append(column)
+                if fields[fieldName]["type"] == "base64" and fieldName in columns and columns[fieldName]["type"] == "string":
+                    # bytea would be assigned to text as hex
+                    sqlValues.append("translate(encode(" + column + ", 'base64'), E'\\n', '')")
+                else:
+                    sqlValues.append(column)
+                sqlUpdates.append(column + " = EXCLUDED." + column)
+
+        sql = "INSERT INTO " + quotedTable + " (" + ", ".join(sqlCols) + ") "
+        sql += "SELECT " + ", ".join(sqlValues) + " FROM " + self.quoteTableOrColumn(stagingTable) + " "
+        sql += "ON CONFLICT (sfId) DO "
+        if len(sqlUpdates) == 0:
+            sql += "NOTHING"
+        else:
+            sql += "UPDATE SET " + ", ".join(sqlUpdates)
+            # unchanged records are not rewritten
+            for modstamp in ["SystemModstamp", "LastModifiedDate"]:
+                if modstamp in fields:
+                    sql += " WHERE " + quotedTable + "." + self.quoteTableOrColumn(modstamp) + " IS DISTINCT FROM EXCLUDED." + self.quoteTableOrColumn(modstamp)
+                    break
+
+        self.executeSql("BEGIN")
+        upserted = self.executeSql(sql).rowcount
+        deleted = 0
+        if deleteMissing:
+            sql = "DELETE FROM " + quotedTable + " WHERE NOT EXISTS (SELECT 1 FROM " + self.quoteTableOrColumn(stagingTable) + " s WHERE s.sfId = " + quotedTable + ".sfId)"
+            deleted = self.executeSql(sql).rowcount
+        self.executeSql("COMMIT")
+
+        self.executeSql("DROP TABLE " + self.quoteTableOrColumn(stagingTable))
+        logger.info(' %s: %s rows inserted or updated, %s rows deleted', tableName, upserted, deleted)
+
+    def swapShadowTable(self, shadowTable, tableName):
+        quotedTable = self.quoteTableOrColumn(tableName)
+        previousTable = tableName + "__previous"
+        quotedPrevious = self.quoteTableOrColumn(previousTable)
+
+        # readers see the old table or the new one, never an empty one
+        logger.info(' swapping %s in as %s', shadowTable, tableName)
+        if args["foreign_keys"]:
+            # keys would follow the replaced table and keep it from being dropped
+            self.dropReferencingKeys(tableName)
+        self.executeSql("BEGIN")
+        self.executeSql("DROP TABLE IF EXISTS " + quotedPrevious)
+        if self.tableExists(tableName):
+            self.executeSql("ALTER TABLE " + quotedTable + " RENAME TO " + quotedPrevious)
+            self.renameTableIndexes(tableName, previousTable)
+        self.executeSql("ALTER TABLE " + self.quoteTableOrColumn(shadowTable) + " RENAME TO " + quotedTable)
+        self.renameTableIndexes(shadowTable, tableName)
+        self.executeSql("COMMIT")
+
+        if args["keep_previous"]:
+            logger.info(' previous data of %s kept in %s', tableName, previousTable)
+        else:
+            self.executeSql("DROP TABLE IF EXISTS " + quotedPrevious)
+
+    def renameTableIndexes(self, oldName, tableName):
+        # index names follow the table, the old names are free for the next load
+        cursor = self.executeSql("SELECT indexname FROM pg_indexes WHERE tablename = %s", (tableName,))
+        for row in cursor.fetchall():
+            if row[0].startswith(oldName + "_"):
+                newName = tableName + row[0][len(oldName):]
+                self.executeSql("ALTER INDEX " + self.quoteTableOrColumn(row[0]) + " RENAME TO " + self.quoteTableOrColumn(newName))
+
+    def finishTable(self, tableName, fields, logged=True):
+        quotedTable = self.quoteTableOrColumn(tableName)
+        steps = []
+
+        # the steps done before an interrupted run are skipped on resume
+        if args["fast_load"] and not self.hasPrimaryKey(tableName):
+            steps.append(("adding primary key", "ALTER TABLE " + quotedTable + " ADD PRIMARY KEY (id)"))
+
+        if args["index_ids"]:
+            steps.append(("indexing sfId", "CREATE INDEX IF NOT EXISTS " + self.quoteTableOrColumn(tableName + "_sfid_idx") + " ON " + quotedTable + " (sfId)"))
+            for fieldName in fields:
+                if fieldName != "Id" and fields[fieldName]["type"] == "id":
+                    steps.append(("indexing " + fieldName, "CREATE INDEX IF NOT EXISTS " + self.quoteTableOrColumn(tableName + "_" + fieldName + "_idx") + " ON " + quotedTable + " (" + self.quoteTableOrColumn(fieldName) + ")"))
+
+        if len(steps) == 0:
+            return
+
+        steps.append(("analyzing", "ANALYZE " + quotedTable))
+        if args["fast_load"] and logged:
+            steps.append(("switching to logged", "ALTER TABLE " + quotedTable + " SET LOGGED"))
+
+        if args["maintenance_work_mem"]:
+            self.executeSql("SET maintenance_work_mem = %s", (args["maintenance_work_mem"],))
+        for number, (step, sql) in enumerate(steps, 1):
+            logger.info(' %s: step %s/%s, %s', tableName, number, len(steps), step)
+            self.executeSql(sql)
+        if args["maintenance_work_mem"]:
+            self.executeSql("RESET maintenance_work_mem")
+
     def getSqlId(self, sfId):
         return base62.decode(sfId[5:15])
 
+    def getSqlIds(self, sfIds):
+        # a whole column at once, same values as getSqlId
+        return base62.decode_many([sfId[5:15] for sfId in sfIds])
+
     def getFieldTypeByValue(self, fieldValue):
-        
-        match = re.findall(r'\D', fieldValue)
-        if len(match) > 0:
-            
-            pattern = re.compile("^\d{4}\-\d{2}\-\d{2} \d{2}:\d{2}:\d{2}$")
-            if pattern.match(fieldValue):
-                return "datetime"
-            
-            pattern = re.compile("^\d{4}\-\d{2}\-\d{2} \d{2}:\d{2}:\d{2}.\d{1}$")
-            if pattern.match(fieldValue):
-                return "datetime"
-            
-            
-            pattern = re.compile("^[0-9A-Za-z]{18}$")
-            if pattern.match(fieldValue):
-                return "id"
-            
-            return "string"
 
-        try:
+        if NON_DIGIT_PATTERN.search(fieldValue) == None:
+            # longer numbers don't fit in a bigint
+            if len(fieldValue) > 18:
+                return "string"
             i = int(fieldValue)
             if(i==0 or i==1):
                 return "bool"
             return "int"
-        except:
-            pass
-        
-        try:
-            float(fieldValue)
+
+        if NEGATIVE_INTEGER_PATTERN.fullmatch(fieldValue):
+            return "int"
+
+        if DECIMAL_PATTERN.fullmatch(fieldValue):
             return "float"
-        except:
-            pass
-        
-        return None
+
+        if DATETIME_PATTERN.fullmatch(fieldValue):
+            return "datetime"
+
+        if ID_PATTERN.fullmatch(fieldValue):
+            return "id"
+
+        return "string"
+
+    def promoteFieldType(self, fieldType, newType):
+        if fieldType == None or fieldType == newType:
+            return newType
+        # bool -> int -> float, anything else can only be stored as a string
+        if fieldType in NUMERIC_TYPE_RANKS and newType in NUMERIC_TYPE_RANKS:
+            if NUMERIC_TYPE_RANKS[newType] > NUMERIC_TYPE_RANKS[fieldType]:
+                return newType
+            return fieldType
+        return "string"
 
     def getFieldTypeByName(self, fieldName):
         if fieldName[-3:]=='__c':
@@ -325,11 +1860,13 @@ class Salesforce_to_PostgreSQL:
         logger.debug('total rows in file : %s', dataCount)
         if int(inserted) != dataCount:
             logger.error('inserted not equal to total rows')
+            return False
+        return True
         
     def resolveFile(self, filePath):
         logger.debug('Checking file: %s', filePath)
 
-        if not os.path.isfile(filePath):
+        if not self.sourceExists(filePath):
             logger.info('Please check file path for %s', filePath)
             logger.error('file not found: %s', filePath)
 
@@ -338,149 +1875,979 @@ class Salesforce_to_PostgreSQL:
             
             logger.debug('Starting analyze for %s', filePath)
 
-            # this function takes forever but we can't bypass, it formats the CSV correctly
-            fileContent = self.makeItPrintable(self.getFileContent(filePath))
+            tableName = self.getTableName(filePath)
+            loadTable = self.getLoadTable(tableName)
 
-            csvData = csv.DictReader(io.StringIO(fileContent))
-            
-            totalRows = 0
-            for row in csvData:
-                totalRows += 1
+            state = self.getJournalState(filePath)
+            if state != None and state["status"] == "done":
+                logger.info('%s already imported, skipping', filePath)
+                return
+            if state != None and state["status"] == "swapped":
+                logger.info('%s already swapped in as %s, finishing', filePath, tableName)
+                self.finishImport(filePath, tableName, loadTable)
+                return
 
-            logger.debug('Analyzing fields')
-            logger.debug('%s headers found', len(csvData.fieldnames))
+            chunks = None
+            if state != None:
+                chunks = state["chunks"]
+            elif args["chunk_jobs"] > 1 and args["loader"] == "copy" and args["test_data"] == None and not self.isArchiveSource(filePath):
+                # compressed streams can't be split, archives are loaded in one piece
+                chunks = self.splitCsvFile(filePath, args["chunk_size"] * 1024 * 1024)
 
-            fields = {}
+            executor = None
+            if chunks != None and len(chunks) > 1:
+                executor = concurrent.futures.ProcessPoolExecutor(max_workers=args["chunk_jobs"], initializer=initWorker, initargs=(args,))
 
-            for fieldName in csvData.fieldnames:
-                fieldType = self.getFieldTypeByName(fieldName)
-
-                if not fieldName in fields:
-                    fields[fieldName] = {
-                        "type":None,
-                        "types":[],
-                        "size":0
-                    }
-                if fieldType != None:
-                    fields[fieldName]["types"].append(fieldType)
-                
-            logger.debug('      Start analyzing values')
-            for row in csvData:
-                for fieldName in csvData.fieldnames:
-                    if row[fieldName] != "":
-                        fieldType = self.getFieldTypeByValue(row[fieldName])
-                        if not fieldType in fields[fieldName]["types"]:
-                            if fieldType !=None:
-                                fields[fieldName]["types"].append(fieldType)
-                    fields[fieldName]["size"] = max(fields[fieldName]["size"], len(str(row[fieldName])))
-
-                # only analyze first 2500 rows
-                # note: this isn't adequate for some exports, causes "column can't be None error"
-                # if totalRows > 2500:
-                #    break
-                
-            # determine type by values in types string
-            for fieldName in csvData.fieldnames:
-                if len(fields[fieldName]["types"]) == 0:
-                    fields[fieldName]["type"] = "string"
-                elif len(fields[fieldName]["types"]) == 1:
-                    fields[fieldName]["type"] = fields[fieldName]["types"][0]
+            try:
+                if state != None:
+                    # the table exists and holds the rows committed before the crash
+                    logger.info('resuming %s into %s', filePath, loadTable)
+                    fields = state["fields"]
+                    totalRows = state["rows"]
                 else:
-                    if "string" in fields[fieldName]["types"]:
-                        fields[fieldName]["type"] = "string"
+                    with self.timings.stage("infer"):
+                        fields, totalRows = self.getSchema(filePath, executor, chunks)
+                    with self.timings.stage("database"):
+                        self.createSqlTable(filePath, fields, loadTable)
+                    self.writeJournal({"file": filePath, "status": "created", "fingerprint": self.getFileFingerprint(filePath),
+                        "fields": fields, "rows": totalRows, "chunks": chunks})
+
+                #insertData(loadTable,filePath,fields)
+                with self.timings.stage("encode"):
+                    if executor != None:
+                        stats = self.copyChunks(executor, loadTable, filePath, fields, chunks)
+                    elif args["loader"] == "insert":
+                        stats = self.insertDataBulk(loadTable, filePath, fields)
                     else:
-                        if "float" in fields[fieldName]["types"] and "int" in fields[fieldName]["types"]:
-                            fields[fieldName]["type"] = "float"
+                        stats = self.copyDataBulk(loadTable, filePath, fields)
+            finally:
+                if executor != None:
+                    executor.shutdown()
+
+            with self.timings.stage("finish"):
+                self.completeLoad(filePath, tableName, loadTable, fields, totalRows)
+            return totalRows, stats
+
+    def getLoadTable(self, tableName):
+        # incremental imports load into a staging table merged afterwards
+        if args["incremental"]:
+            return tableName + "__staging"
+        # swapped imports load into a shadow table renamed afterwards
+        if args["swap"]:
+            return tableName + "__shadow"
+        return tableName
+
+    def completeLoad(self, journalKey, tableName, loadTable, fields, totalRows):
+        valid = True
+        quarantined = self.countQuarantined(loadTable)
+        if args["test_data"]==None:
+            # quarantined rows are counted but never inserted
+            valid = self.checkInsertCount(loadTable,totalRows - quarantined)
+
+        # a staging table is only logged if it becomes the table
+        self.finishTable(loadTable, fields, not args["incremental"])
+
+        if args["swap"]:
+            if not valid:
+                logger.error('%s not swapped in, %s keeps the previous data', loadTable, tableName)
+                return
+            self.swapShadowTable(loadTable, tableName)
+            # the shadow table is gone, a resumed run only finishes the import
+            self.writeJournal({"file": journalKey, "status": "swapped"})
+
+        if args["incremental"]:
+            deleteMissing = args["delete_missing"] and args["test_data"]==None
+            if deleteMissing and (not valid or quarantined > 0):
+                # records missing from an incomplete load are not known to be deleted
+                logger.warning(' %s: the load is incomplete, rows missing from it are not deleted', tableName)
+                deleteMissing = False
+            self.mergeStagingTable(loadTable, tableName, fields, deleteMissing)
+
+        self.finishImport(journalKey, tableName, loadTable)
+
+    def finishImport(self, journalKey, tableName, loadTable):
+        if args["relations"] and loadTable != tableName:
+            self.publishRelations(loadTable, tableName)
+
+        self.writeJournal({"file": journalKey, "status": "done"})
+
+    def getObjectName(self, filePath):
+        return PART_SUFFIX_PATTERN.sub("", self.getTableName(filePath))
+
+    def groupFileParts(self, filePaths):
+        # parts of the same object, split in numbered files or spread over several archives
+        groups = {}
+        for filePath in filePaths:
+            groups.setdefault(self.getObjectName(filePath), []).append(filePath)
+
+        objects = []
+        for objectName, parts in groups.items():
+            if len(parts) == 1:
+                # a single file keeps the table named after it
+                objects.append((self.getTableName(parts[0]), parts))
+            else:
+                objects.append((objectName, sorted(parts)))
+        return objects
+
+    def resolveObject(self, tableName, filePaths):
+        # every table is timed on its own, see --report and --profile
+        self.timings = _Timings()
+        profiler = None
+        if args["profile"] and args["profile_table"] in (None, tableName):
+            profiler = cProfile.Profile()
+            profiler.enable()
+        started = time.perf_counter()
+        # (rows, load stats), None if nothing was loaded
+        result = None
+        try:
+            if len(filePaths) == 1:
+                result = self.resolveFile(filePaths[0])
+            else:
+                result = self.resolveFileParts(tableName, filePaths)
+        finally:
+            if profiler != None:
+                profiler.disable()
+                os.makedirs(args["profile"], exist_ok=True)
+                profiler.dump_stats(os.path.join(args["profile"], tableName + ".prof"))
+            totalRows, stats = result or (0, self.newLoadStats())
+            self.addTableReport(tableName, filePaths, totalRows, stats, time.perf_counter() - started)
+
+    def resolveObjectWithStats(self, tableName, filePaths):
+        self.resolveObject(tableName, filePaths)
+        return self.schemaCacheStats, self.tableReports
+
+    def addTableReport(self, tableName, filePaths, totalRows, stats, seconds):
+        size = sum(self.getSourceSize(filePath) for filePath in filePaths if self.sourceExists(filePath))
+        seconds = max(seconds, 1e-9)
+        batches = max(stats["batches"], 1)
+        stages = self.timings.seconds
+        self.tableReports.append({
+            "table": tableName,
+            "files": len(filePaths),
+            "rows": totalRows,
+            "bytes": size,
+            "seconds": seconds,
+            "rows_per_s": totalRows / seconds,
+            "bytes_per_s": size / seconds,
+            "peak_rss_mb": getPeakRss(),
+            # loaded in this run, a resumed load skips the committed batches
+            "batches": stats["batches"],
+            "commits": stats["commits"],
+            "avg_batch_rows": stats["rows"] / batches,
+            "avg_batch_kb": stats["size"] / batches / 1024,
+            # summed over the threads and processes working on the table
+            "stages": dict((stage, stages.get(stage, 0.0)) for stage in STAGES)
+        })
+        logger.info('%s: %s rows in %.1fs, %.0f rows/s, %.1f MB/s (%s)', tableName, totalRows, seconds, totalRows / seconds,
+            size / seconds / (1024 * 1024), ", ".join("%s %.1fs" % (stage, stages[stage]) for stage in STAGES if stages.get(stage)))
+
+    def writeReport(self, reportPath, seconds):
+        if reportPath.lower().endswith(".csv"):
+            with open(reportPath, "w", newline='') as fp:
+                writer = csv.writer(fp)
+                columns = ["table", "files", "rows", "bytes", "seconds", "rows_per_s", "bytes_per_s", "peak_rss_mb",
+                    "batches", "commits", "avg_batch_rows", "avg_batch_kb"]
+                writer.writerow(columns + [stage + "_s" for stage in STAGES])
+                for report in self.tableReports:
+                    writer.writerow([report[column] for column in columns] + [report["stages"][stage] for stage in STAGES])
+        else:
+            with open(reportPath, "w") as fp:
+                json.dump({"seconds": seconds, "peak_rss_mb": getPeakRss(), "tables": self.tableReports}, fp, indent=2)
+        logger.info('report written to %s', reportPath)
+
+    def resolveFileParts(self, tableName, filePaths):
+        logger.info('importing %s parts of %s', len(filePaths), tableName)
+
+        for filePath in filePaths:
+            if not self.sourceExists(filePath):
+                logger.error('file not found: %s', filePath)
+                return
+
+        loadTable = self.getLoadTable(tableName)
+
+        # the journal tracks the parts as one load, named after the table
+        state = self.getJournalState(tableName, filePaths)
+        if state != None and state["status"] == "done":
+            logger.info('%s already imported, skipping', tableName)
+            return
+        if state != None and state["status"] == "swapped":
+            logger.info('%s already swapped in, finishing', tableName)
+            self.finishImport(tableName, tableName, loadTable)
+            return
+
+        executor = None
+        if args["chunk_jobs"] > 1:
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=args["chunk_jobs"], initializer=initWorker, initargs=(args,))
+
+        try:
+            if state != None:
+                logger.info('resuming %s parts into %s', len(filePaths), loadTable)
+                fields = state["fields"]
+                totalRows = state["rows"]
+            else:
+                with self.timings.stage("infer"):
+                    fields, totalRows = self.getPartsSchema(executor, filePaths)
+                with self.timings.stage("database"):
+                    self.createSqlTable(filePaths[0], fields, loadTable)
+                self.writeJournal({"file": tableName, "status": "created", "fingerprint": self.getPartsFingerprint(filePaths),
+                    "fields": fields, "rows": totalRows, "chunks": None, "parts": filePaths})
+
+            with self.timings.stage("encode"):
+                stats = self.loadParts(executor, loadTable, filePaths, fields)
+        finally:
+            if executor != None:
+                executor.shutdown()
+
+        # totalRows is the sum over the parts
+        with self.timings.stage("finish"):
+            self.completeLoad(tableName, tableName, loadTable, fields, totalRows)
+        return totalRows, stats
+
+    def getPartsSchema(self, executor, filePaths):
+        # one schema for all parts, columns missing from a part are NULL there
+        if executor != None:
+            futures = [executor.submit(analyzePartWorker, filePath) for filePath in filePaths]
+            results = []
+            for future in futures:
+                with self.timings.stage("wait"):
+                    partFields, partRows, schemaCacheStats, seconds = future.result()
+                self.timings.add(seconds)
+                results.append((partFields, partRows, schemaCacheStats))
+        else:
+            results = [self.analyzeFile(filePath) + (None,) for filePath in filePaths]
+
+        fields = {}
+        totalRows = 0
+        for partFields, partRows, schemaCacheStats in results:
+            self.mergeFields(fields, partFields)
+            totalRows += partRows
+            if schemaCacheStats != None:
+                for key in schemaCacheStats:
+                    self.schemaCacheStats[key] += schemaCacheStats[key]
+
+        self.resolveFieldTypes(fields)
+        return fields, totalRows
+
+    def getPartsFingerprint(self, filePaths):
+        return hashlib.sha1("\n".join(self.getFileFingerprint(filePath) for filePath in filePaths).encode()).hexdigest()
+
+    def loadParts(self, executor, tableName, filePaths, fields):
+        if executor != None:
+            futures = [executor.submit(loadPartWorker, tableName, filePath, fields) for filePath in filePaths]
+            results = [self.getWorkerResult(future) for future in futures]
+        else:
+            results = [self.loadPart(tableName, filePath, fields) for filePath in filePaths]
+
+        stats = self.newLoadStats()
+        for partStats in results:
+            for key in stats:
+                stats[key] += partStats[key]
+        logger.debug(' %s rows loaded into %s from %s parts', stats["rows"], tableName, len(filePaths))
+        self.logLoadStats(tableName, stats)
+        return stats
+
+    def loadPart(self, tableName, filePath, fields):
+        if args["loader"] == "insert":
+            return self.insertDataBulk(tableName, filePath, fields)
+        return self.copyDataBulk(tableName, filePath, fields)
+
+    def getJournal(self):
+        # last state of every file and committed rows of every file or chunk
+        if self._journal == None:
+            self._journal = {"files": {}, "committed": {}}
+            if args["resume"] and os.path.isfile(args["journal"]):
+                with open(args["journal"]) as fp:
+                    for line in fp:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            # line torn by the crash
+                            continue
+                        if "committed" in record:
+                            self._journal["committed"][(record["file"], record["chunk"])] = record["committed"]
                         else:
-                            fields[fieldName]["type"] = "string"
+                            if record["status"] == "created":
+                                # a new load of the file or its parts, earlier progress is gone
+                                self.forgetCommittedRows(record.get("parts") or [record["file"]])
+                            self._journal["files"][record["file"]] = record
+        return self._journal
+
+    def forgetCommittedRows(self, files):
+        for key in [key for key in self._journal["committed"] if key[0] in files]:
+            del self._journal["committed"][key]
+
+    def getJournalState(self, filePath, parts=None):
+        state = self.getJournal()["files"].get(filePath)
+        if state != None and state["status"] == "created":
+            if parts != None:
+                changed = state.get("parts") != parts or state["fingerprint"] != self.getPartsFingerprint(parts)
+            else:
+                changed = state["fingerprint"] != self.getFileFingerprint(filePath)
+            if changed:
+                logger.info('%s changed since the interrupted run, starting over', filePath)
+            elif args["fast_load"]:
+                # a server crash truncates unlogged tables, the committed rows may be gone
+                logger.info('%s was loaded into an unlogged table, starting over', filePath)
+            else:
+                return state
+            self.forgetCommittedRows(parts or [filePath])
+            return None
+        return state
+
+    def getCommittedRows(self, filePath, start=None):
+        return self.getJournal()["committed"].get((filePath, start), 0)
+
+    def writeJournal(self, record):
+        if not args["journal"]:
+            return
+        # a single append per record, parallel jobs share the journal
+        fd = os.open(args["journal"], os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+        try:
+            os.write(fd, (json.dumps(record) + "\n").encode())
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def getSchema(self, filePath, executor=None, chunks=None):
+        fields, totalRows = self.analyzeFile(filePath, executor, chunks)
+        self.resolveFieldTypes(fields)
+        return fields, totalRows
+
+    def analyzeFile(self, filePath, executor=None, chunks=None):
+        # columns without any typed value keep a None type, see resolveFieldTypes
+        tableName = self.getTableName(filePath)
+        fieldNames = self.readCsvHeader(filePath)
+        fingerprint = None
+        cached = None
+
+        if args["schema_cache"]:
+            fingerprint = self.getFileFingerprint(filePath)
+            cached = self.loadCachedSchema(tableName, fieldNames)
+            if cached != None and cached["fingerprint"] == fingerprint:
+                logger.info('schema cache hit for %s', tableName)
+                self.schemaCacheStats["hit"] += 1
+                return cached["fields"], cached["rows"]
+
+        if executor != None:
+            fields, totalRows = self.analyzeChunks(executor, filePath, chunks)
+        elif self.useArrowEngine():
+            fields = self.newFields(fieldNames)
+            totalRows = self.analyzeBatches(self.readCsvBatches(filePath, fieldNames), fields)
+        else:
+            csvData = csv.DictReader(self.readCsvLines(filePath))
+            fields = self.newFields(csvData.fieldnames)
+
+            # rows are counted and analyzed in the same pass over the file
+            totalRows = self.analyzeRows(csvData, fields)
+
+        if args["schema_cache"]:
+            if cached != None:
+                # same header, new content: types only ever get wider
+                logger.info('schema cache widened for %s', tableName)
+                self.schemaCacheStats["widened"] += 1
+                self.mergeFields(fields, cached["fields"])
+            else:
+                logger.info('schema cache miss for %s', tableName)
+                self.schemaCacheStats["miss"] += 1
+
+        if args["schema_cache"]:
+            self.storeCachedSchema(tableName, fieldNames, fingerprint, fields, totalRows)
+
+        return fields, totalRows
+
+    def getFileFingerprint(self, filePath):
+        archivePath, memberName = self.getArchiveMember(filePath)
+        if memberName != None:
+            # zip members carry their own size and checksum
+            with zipfile.ZipFile(archivePath) as archive:
+                info = archive.getinfo(memberName)
+            return hashlib.sha1(("%s:%s:%s" % (info.file_size, info.CRC, info.date_time)).encode()).hexdigest()
+
+        # size plus the first and last blocks, cheap even on huge files
+        size = os.path.getsize(filePath)
+        digest = hashlib.sha1(str(size).encode())
+        with open(filePath, 'rb') as fp:
+            digest.update(fp.read(65536))
+            if size > 65536:
+                fp.seek(max(size - 65536, 65536))
+                digest.update(fp.read())
+        return digest.hexdigest()
+
+    def getSchemaCachePath(self, tableName, fieldNames):
+        headerHash = hashlib.sha1("\x00".join(fieldNames).encode()).hexdigest()
+        return os.path.join(args["schema_cache"], tableName + "." + headerHash[:16] + ".json")
+
+    def loadCachedSchema(self, tableName, fieldNames):
+        cachePath = self.getSchemaCachePath(tableName, fieldNames)
+        if args["invalidate_schema_cache"] or not os.path.isfile(cachePath):
+            return None
+        try:
+            with open(cachePath) as fp:
+                return json.load(fp)
+        except (OSError, ValueError) as e:
+            logger.warning('ignoring schema cache %s : %s', cachePath, e)
+            return None
+
+    def storeCachedSchema(self, tableName, fieldNames, fingerprint, fields, totalRows):
+        cachePath = self.getSchemaCachePath(tableName, fieldNames)
+        os.makedirs(args["schema_cache"], exist_ok=True)
+        # written aside and renamed, parallel jobs never read half a file
+        with open(cachePath + ".tmp", "w") as fp:
+            json.dump({"fingerprint": fingerprint, "rows": totalRows, "fields": fields}, fp)
+        os.replace(cachePath + ".tmp", cachePath)
+
+    def logSchemaCacheStats(self):
+        if args["schema_cache"]:
+            logger.info('schema cache: %s hits, %s widened, %s misses',
+                self.schemaCacheStats["hit"], self.schemaCacheStats["widened"], self.schemaCacheStats["miss"])
+
+    def newFields(self, fieldNames):
+        logger.debug('Analyzing fields')
+        logger.debug('%s headers found', len(fieldNames))
+
+        fields = {}
+
+        for fieldName in fieldNames:
+            fieldType = self.getFieldTypeByName(fieldName)
+
+            if not fieldName in fields:
+                fields[fieldName] = {
+                    "type":None,
+                    "types":[],
+                    "size":0,
+                    "base64":None,
+                    "digits":0
+                }
+            if fieldType != None:
+                fields[fieldName]["type"] = fieldType
+                fields[fieldName]["types"].append(fieldType)
+
+        return fields
+
+    def analyzeRows(self, csvData, fields):
+        logger.debug('      Start analyzing values')
+
+        fieldNames = list(fields)
+        types = [fields[fieldName]["type"] for fieldName in fieldNames]
+        sizes = [fields[fieldName]["size"] for fieldName in fieldNames]
+        # False once a value isn't base64, True once one of BASE64_MIN_SIZE is seen, None before
+        encoded = [fields[fieldName].get("base64") for fieldName in fieldNames]
+        # digits of the longest int value
+        digits = [fields[fieldName].get("digits", 0) for fieldName in fieldNames]
+
+        # types come from every row, or the first --sample-rows rows, where the
+        # rows after the sample must fit the sampled types
+        sampleRows = None if args["full_scan"] else args["sample_rows"]
+        totalRows = 0
+        for row in itertools.islice(csvData, sampleRows):
+            totalRows += 1
+            for index, fieldName in enumerate(fieldNames):
+                value = row[fieldName]
+                if not value:
+                    continue
+                if len(value) > sizes[index]:
+                    sizes[index] = len(value)
+                if encoded[index] != False:
+                    if BASE64_PATTERN.fullmatch(value) == None:
+                        encoded[index] = False
+                    elif len(value) >= BASE64_MIN_SIZE:
+                        encoded[index] = True
+                if types[index] != "string":
+                    fieldType = self.getFieldTypeByValue(value)
+                    if fieldType == "int" and len(value) > digits[index]:
+                        digits[index] = len(value.lstrip("-"))
+                    if fieldType != types[index]:
+                        if not fieldType in fields[fieldName]["types"]:
+                            fields[fieldName]["types"].append(fieldType)
+                        types[index] = self.promoteFieldType(types[index], fieldType)
+
+        # sizes are tracked on every row, wide text columns must become text
+        for row in csvData:
+            totalRows += 1
+            for index, fieldName in enumerate(fieldNames):
+                value = row[fieldName]
+                if value and len(value) > sizes[index]:
+                    sizes[index] = len(value)
+
+        for index, fieldName in enumerate(fieldNames):
+            fields[fieldName]["type"] = types[index]
+            fields[fieldName]["size"] = sizes[index]
+            fields[fieldName]["base64"] = encoded[index]
+            fields[fieldName]["digits"] = digits[index]
+        return totalRows
+
+    def analyzeBatches(self, batches, fields):
+        # analyzeRows over Arrow record batches, every column of a batch at once
+        logger.debug('      Start analyzing values')
+        compute = pyarrow.compute
+
+        fieldNames = list(fields)
+        types = [fields[fieldName]["type"] for fieldName in fieldNames]
+        sizes = [fields[fieldName]["size"] for fieldName in fieldNames]
+        encoded = [fields[fieldName].get("base64") for fieldName in fieldNames]
+        digits = [fields[fieldName].get("digits", 0) for fieldName in fieldNames]
+
+        sampleRows = None if args["full_scan"] else args["sample_rows"]
+        totalRows = 0
+        for batch in batches:
+            sample = batch.num_rows if sampleRows == None else min(batch.num_rows, max(sampleRows - totalRows, 0))
+            totalRows += batch.num_rows
+            for index, fieldName in enumerate(fieldNames):
+                column = batch.column(index)
+                lengths = compute.utf8_length(column)
+                size = compute.max(lengths).as_py()
+                if size != None and size > sizes[index]:
+                    sizes[index] = size
+                if sample == 0:
+                    continue
+                values = column.slice(0, sample)
+                if encoded[index] != False:
+                    present = compute.not_equal(values, "")
+                    matched = compute.match_substring_regex(values, ARROW_BASE64_PATTERN)
+                    if compute.any(compute.and_(present, compute.invert(matched))).as_py():
+                        encoded[index] = False
+                    elif compute.any(compute.greater_equal(lengths.slice(0, sample), BASE64_MIN_SIZE)).as_py():
+                        encoded[index] = True
+                if types[index] != "string":
+                    types[index], columnDigits = self.analyzeColumn(values, types[index], fields[fieldName]["types"])
+                    digits[index] = max(digits[index], columnDigits)
+
+        for index, fieldName in enumerate(fieldNames):
+            fields[fieldName]["type"] = types[index]
+            fields[fieldName]["size"] = sizes[index]
+            fields[fieldName]["base64"] = encoded[index]
+            fields[fieldName]["digits"] = digits[index]
+        return totalRows
+
+    def analyzeColumn(self, values, fieldType, fieldTypes):
+        # analyzeRows only changes the type on the first value of each type,
+        # so the first position of every type replays it exactly, the digits
+        # of the longest int value are returned with the type
+        compute = pyarrow.compute
+        present = compute.not_equal(values, "")
+        simple = compute.and_(compute.string_is_ascii(values), compute.invert(compute.match_substring(values, "\n")))
+
+        remaining = compute.and_(present, simple)
+        digits = compute.and_(remaining, compute.match_substring_regex(values, ARROW_DIGITS_PATTERN))
+        # longer numbers don't fit in a bigint
+        lengths = compute.utf8_length(values)
+        wide = compute.greater(lengths, 18)
+        flags = compute.match_substring_regex(values, ARROW_FLAG_PATTERN)
+        positive = compute.and_(digits, compute.invert(compute.or_(wide, flags)))
+        masks = [
+            ("string", compute.and_(digits, wide)),
+            ("bool", compute.and_(compute.and_(digits, compute.invert(wide)), flags)),
+            ("int", positive)
+        ]
+        remaining = compute.and_(remaining, compute.invert(digits))
+        for valueType, pattern in ARROW_VALUE_PATTERNS:
+            matched = compute.and_(remaining, compute.match_substring_regex(values, pattern))
+            masks.append((valueType, matched))
+            remaining = compute.and_(remaining, compute.invert(matched))
+            if valueType == "int":
+                negative = matched
+        masks.append(("string", remaining))
+
+        first = {}
+        for valueType, mask in masks:
+            position = compute.index(mask, True).as_py()
+            if position >= 0 and position < first.get(valueType, len(values)):
+                first[valueType] = position
+        # the few other values, up to the first string
+        for position in compute.indices_nonzero(compute.and_(present, compute.invert(simple))).to_pylist():
+            if position >= first.get("string", len(values)):
+                break
+            valueType = self.getFieldTypeByValue(values[position].as_py())
+            if position < first.get(valueType, len(values)):
+                first[valueType] = position
+
+        # values after the one the column becomes a string on are not typed
+        end = len(values)
+        for position, valueType in sorted((position, valueType) for valueType, position in first.items()):
+            if fieldType == "string":
+                break
+            if valueType != fieldType:
+                if not valueType in fieldTypes:
+                    fieldTypes.append(valueType)
+                fieldType = self.promoteFieldType(fieldType, valueType)
+                if fieldType == "string":
+                    end = position + 1
+
+        # the negative ints of the int pattern have a sign
+        lengths = lengths.slice(0, end)
+        intDigits = max(compute.max(compute.if_else(positive.slice(0, end), lengths, 0)).as_py() or 0,
+            (compute.max(compute.if_else(negative.slice(0, end), lengths, 0)).as_py() or 0) - 1)
+        return fieldType, intDigits
+
+    def mergeFields(self, fields, other):
+        for fieldName in other:
+            if not fieldName in fields:
+                fields[fieldName] = {"type": None, "types": [], "size": 0, "base64": None, "digits": 0}
+            for fieldType in other[fieldName]["types"]:
+                if not fieldType in fields[fieldName]["types"]:
+                    fields[fieldName]["types"].append(fieldType)
+            # a type without any typed value is the string resolveFieldTypes defaults to
+            if other[fieldName]["types"]:
+                fields[fieldName]["type"] = self.promoteFieldType(fields[fieldName]["type"], other[fieldName]["type"])
+            fields[fieldName]["size"] = max(fields[fieldName]["size"], other[fieldName]["size"])
+            if other[fieldName].get("base64") != None and fields[fieldName]["base64"] != False:
+                fields[fieldName]["base64"] = other[fieldName]["base64"]
+            fields[fieldName]["digits"] = max(fields[fieldName].get("digits", 0), other[fieldName].get("digits", 0))
+
+    def resolveFieldTypes(self, fields):
+        # columns without any typed value are strings, large base64 values are decoded to bytes,
+        # ints too long for decimal(15,2) make a column of ints and floats a string
+        for fieldName in fields:
+            if fields[fieldName]["type"] == None:
+                fields[fieldName]["type"] = "string"
+            if fields[fieldName]["type"] == "float" and fields[fieldName].get("digits", 0) > DECIMAL_INTEGER_DIGITS:
+                fields[fieldName]["type"] = "string"
+            if fields[fieldName]["type"] == "string" and fields[fieldName].get("base64"):
+                fields[fieldName]["type"] = "base64"
                                 
-            for fieldName in csvData.fieldnames:
-                logger.debug('  %s is a %s', fieldName, fields[fieldName]["type"])
-                logger.debug('  types of %s are %s', fieldName, fields[fieldName]["types"])
-                
-            tableName = self.createSqlTable(filePath, fields)
+        for fieldName in fields:
+            logger.debug('  %s is a %s', fieldName, fields[fieldName]["type"])
+            logger.debug('  types of %s are %s', fieldName, fields[fieldName]["types"])
 
-            #insertData(tableName,fileContent,fields)
-            self.insertDataBulk(tableName, fileContent, fields)
-            if args["test_data"]==None:
-                self.checkInsertCount(tableName,totalRows)
-                        
+    def splitCsvFile(self, filePath, chunkSize):
+        # byte ranges of whole records, newlines inside quoted values don't end a record
+        if os.path.getsize(filePath) <= chunkSize:
+            return None
 
-    def resolveDirectory(self, dirPath):
-        logger.debug('Checking directory: %s', dirPath)
+        boundaries = []
+        target = 0
+        inQuotes = False
+        offset = 0
+        with open(filePath, 'rb') as fp:
+            while True:
+                block = fp.read(self.readChunkSize)
+                if not block:
+                    break
+                position = 0
+                while True:
+                    searchFrom = max(target - offset, position)
+                    if searchFrom >= len(block):
+                        break
+                    inQuotes ^= block.count(b'"', position, searchFrom) % 2 == 1
+                    position = searchFrom
+                    newline = block.find(b"\n", position)
+                    if newline < 0:
+                        break
+                    inQuotes ^= block.count(b'"', position, newline) % 2 == 1
+                    position = newline + 1
+                    if not inQuotes:
+                        boundaries.append(offset + position)
+                        target = offset + position + chunkSize
+                inQuotes ^= block.count(b'"', position) % 2 == 1
+                offset += len(block)
+
+        # the first boundary is the end of the header line
+        boundaries.append(offset)
+        chunks = []
+        for start, end in zip(boundaries, boundaries[1:]):
+            if end > start:
+                chunks.append((start, end))
+        logger.debug('%s split in %s chunks', filePath, len(chunks))
+        return chunks
+
+    def readCsvHeader(self, filePath):
+        return next(csv.reader(self.readCsvLines(filePath)))
 
+    def analyzeChunks(self, executor, filePath, chunks):
+        fields = self.newFields(self.readCsvHeader(filePath))
+        futures = [executor.submit(analyzeChunkWorker, filePath, start, end, list(fields)) for start, end in chunks]
+        totalRows = 0
+        for future in futures:
+            chunkFields, chunkRows = self.getWorkerResult(future)
+            self.mergeFields(fields, chunkFields)
+            totalRows += chunkRows
+        return fields, totalRows
+
+    def copyChunks(self, executor, tableName, filePath, fields, chunks):
+        futures = [executor.submit(copyChunkWorker, tableName, filePath, fields, start, end) for start, end in chunks]
+        stats = self.newLoadStats()
+        for future in futures:
+            chunkStats = self.getWorkerResult(future)
+            for key in stats:
+                stats[key] += chunkStats[key]
+        logger.debug(' %s rows copied into %s from %s chunks', stats["rows"], tableName, len(chunks))
+        self.logLoadStats(tableName, stats)
+        return stats
+
+    def getWorkerResult(self, future):
+        # workers send their stage timings along with the result
+        with self.timings.stage("wait"):
+            result, seconds = future.result()
+        self.timings.add(seconds)
+        return result
+
+    def getBlacklist(self):
         # get blacklist files
         blacklist = []
-        if "blacklist_file" in args:
+        if args["blacklist_file"]:
             blacklist_file = open(args["blacklist_file"], "r")
             blacklist = blacklist_file.readlines()
             blacklist = list(map(str.strip, blacklist))
+        return blacklist
+
+    def resolveDirectory(self, dirPath):
+        logger.debug('Checking directory: %s', dirPath)
+
+        blacklist = self.getBlacklist()
 
         if not os.path.isdir(dirPath):
             logger.info('Please check directory path for %s', dirPath)
             logger.error('Directory not found: %s', dirPath)
 
         logger.debug(' reading directory(%s) to find csv files', dirPath)
+        filePaths = []
         for fileName in sorted(os.listdir(dirPath)):
             filePath = os.path.join(dirPath,fileName)
             if filePath[-3:]=="csv":
                 if fileName not in blacklist:
-                    try:
-                        self.resolveFile(filePath)
-                    except Exception as ex:
-                        logger.error("Couldn't import %s" % filePath)
-                        
-                        logger.error("Stack trace: ")
-                        traceback.print_tb(sys.exc_info()[2])
-
-                        logging.error(type(ex))
-                        logging.error(ex)
-        
+                    filePaths.append(filePath)
+
+        return self.resolveFiles(filePaths)
+
+    def resolveArchives(self, archivePaths):
+        blacklist = self.getBlacklist()
+
+        filePaths = []
+        for archivePath in archivePaths:
+            if not os.path.isfile(archivePath):
+                logger.info('Please check archive path for %s', archivePath)
+                logger.error('Archive not found: %s', archivePath)
+                continue
+
+            logger.debug(' reading archive(%s) to find csv files', archivePath)
+            for filePath in self.listArchive(archivePath):
+                # the blacklist names csv files, not the archives holding them
+                if self.getMemberName(filePath) not in blacklist:
+                    filePaths.append(filePath)
+
+        # members of every archive share the --jobs workers
+        return self.resolveFiles(filePaths)
+
+    def resolveFiles(self, filePaths):
+        objects = self.groupFileParts(filePaths)
+        if args["jobs"] > 1:
+            self.resolveFilesParallel(objects)
+        else:
+            for tableName, parts in objects:
+                try:
+                    self.resolveObject(tableName, parts)
+                except Exception as ex:
+                    self.logImportError(", ".join(parts), ex)
+
+        self.logSchemaCacheStats()
         return True
 
-if (__name__ == "__main__"):
+    def resolveFilesParallel(self, objects):
+        # largest objects first so the slowest imports don't start last
+        objects = sorted(objects, key=lambda item: sum(map(self.getSourceSize, item[1])), reverse=True)
+        logger.info('Importing %s objects with %s jobs', len(objects), args["jobs"])
 
-    args = None
-    logger = logging.getLogger("sf_csv_export_to_database.py")
-    database = None
-    
+        with concurrent.futures.ProcessPoolExecutor(max_workers=args["jobs"], initializer=initWorker, initargs=(args,)) as executor:
+            futures = {}
+            for tableName, parts in objects:
+                futures[executor.submit(resolveObjectWorker, tableName, parts)] = parts
+
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    (schemaCacheStats, tableReports), seconds = future.result()
+                except Exception as ex:
+                    self.logImportError(", ".join(futures[future]), ex)
+                    continue
+                for key in schemaCacheStats:
+                    self.schemaCacheStats[key] += schemaCacheStats[key]
+                self.tableReports.extend(tableReports)
+
+    def logImportError(self, filePath, ex):
+        logger.error("Couldn't import %s" % filePath)
+
+        logger.error("Stack trace: ")
+        traceback.print_tb(ex.__traceback__)
+
+        logging.error(type(ex))
+        logging.error(ex)
+
+
+def connectDatabase(options):
+    database = psycopg2.connect(**connectionParameters(options))
+    database.autocommit = True
+    return database
+
+
+def connectionParameters(options):
+    parameters = {
+        "host": options["sql_host"],
+        "port": options["sql_port"],
+        "user": options["sql_user"],
+        "password": options["sql_password"],
+        "database": options["sql_database"]
+    }
+    # session settings of the import connections only
+    if options["synchronous_commit_off"]:
+        parameters["options"] = "-c synchronous_commit=off"
+    return parameters
+
+
+def configureLogging(options, fileMode='w'):
+    logLevel = logging.INFO
+
+    if options["debug"]:
+        logLevel = logging.DEBUG
+
+    # log file
+    if options["log_file"]:
+        logging.basicConfig(filename=options["log_file"], filemode=fileMode, level=logLevel)
+    else:
+        logging.basicConfig(level=logLevel)
+
+
+def initWorker(options):
+    global args, _pool
+    args = options
+    # forked workers inherit the handlers, spawned ones append to the log file
+    configureLogging(args, fileMode='a')
+    _pool = psycopg2.pool.SimpleConnectionPool(1, 1, **connectionParameters(args))
+
+
+def runWithPooledConnection(method, *params):
+    database = _pool.getconn()
+    database.autocommit = True
+    try:
+        salesforce = Salesforce_to_PostgreSQL()
+        salesforce._database = database
+        result = getattr(salesforce, method)(*params)
+    except BaseException:
+        # the connection may be in an unknown state, don't hand it out again
+        _pool.putconn(database, close=True)
+        raise
+    _pool.putconn(database)
+    return result, salesforce.timings.seconds
+
+
+def resolveObjectWorker(tableName, filePaths):
+    return runWithPooledConnection("resolveObjectWithStats", tableName, filePaths)
+
+
+def analyzePartWorker(filePath):
+    salesforce = Salesforce_to_PostgreSQL()
+    with salesforce.timings.stage("infer"):
+        fields, totalRows = salesforce.analyzeFile(filePath)
+    return fields, totalRows, salesforce.schemaCacheStats, salesforce.timings.seconds
+
+
+def loadPartWorker(tableName, filePath, fields):
+    return runWithPooledConnection("loadPart", tableName, filePath, fields)
+
+
+def analyzeChunkWorker(filePath, start, end, fieldNames):
+    salesforce = Salesforce_to_PostgreSQL()
+    fields = salesforce.newFields(fieldNames)
+    with salesforce.timings.stage("infer"):
+        if salesforce.useArrowEngine():
+            totalRows = salesforce.analyzeBatches(salesforce.readCsvBatches(filePath, fieldNames, start, end), fields)
+        else:
+            csvData = csv.DictReader(salesforce.readCsvLines(filePath, start, end), fieldnames=fieldNames)
+            totalRows = salesforce.analyzeRows(csvData, fields)
+    return (fields, totalRows), salesforce.timings.seconds
+
+
+def copyChunkWorker(tableName, filePath, fields, start, end):
+    return runWithPooledConnection("copyDataBulk", tableName, filePath, fields, start, end)
+
+
+def getArgumentParser():
     parser = argparse.ArgumentParser()
     parser.add_argument('--directory', help='path of csv directory')
     parser.add_argument('--file', help='path of csv file')
+    parser.add_argument('--archive', help='path of a zip export or of a gzip/zstd compressed csv file, repeatable',action='append')
     parser.add_argument('--debug', help='debug',action='store_true')
     parser.add_argument('--test-data', help='test data size per file',type=int)
     parser.add_argument('--log-file', help='path of log file')
     parser.add_argument('--blacklist-file', help='path of blacklist file')
+    parser.add_argument('--loader', help='how rows are sent to the database',choices=['copy','insert'],default='copy')
+    parser.add_argument('--jobs', help='number of files imported in parallel',type=int,default=1)
+    parser.add_argument('--chunk-jobs', help='number of chunks of a large file, or parts of an object, loaded in parallel',type=int,default=1)
+    parser.add_argument('--chunk-size', help='size in MB of the chunks a large file is split in',type=int,default=256)
+    parser.add_argument('--sample-rows', help='infer column types from the first rows of each file only, a later value of another type fails the load',type=int)
+    parser.add_argument('--full-scan', help='infer column types from every row, the default unless --sample-rows is set',action='store_true')
+    parser.add_argument('--schema-cache', help='directory caching the inferred schemas between runs')
+    parser.add_argument('--invalidate-schema-cache', help='ignore and rewrite the cached schemas',action='store_true')
+    parser.add_argument('--incremental', help='upsert into the existing tables by sfId instead of reloading them',action='store_true')
+    parser.add_argument('--delete-missing', help='with --incremental, delete rows missing from the export',action='store_true')
+    parser.add_argument('--normalize-columns', help='comma separated string columns folded to ASCII (NFKD), * for all, empty for none',default='*')
+    parser.add_argument('--fast-load', help='load into unlogged tables, add the primary key afterwards',action='store_true')
+    parser.add_argument('--index-ids', help='index sfId and every id column after the load',action='store_true')
+    parser.add_argument('--swap', help='load into a shadow table and swap it in when the row count checks out',action='store_true')
+    parser.add_argument('--keep-previous', help='with --swap, keep the replaced table as <table>__previous',action='store_true')
+    parser.add_argument('--copy-format', help='COPY data format, binary skips formatting and parsing numbers and timestamps, tables with base64 columns are always copied in binary',choices=['text','binary'],default='text')
+    parser.add_argument('--engine', help='sync runs parsing and database writes in turn, pipeline overlaps them, arrow parses, analyzes and converts text COPY rows in Arrow record batches (requires pyarrow, sync without it)',choices=['sync','pipeline','arrow'],default='sync')
+    parser.add_argument('--pipeline-queue', help='with --engine pipeline, blocks of %s encoded rows queued for the database' % Salesforce_to_PostgreSQL.pipelineBlockRows,type=int,default=8)
+    parser.add_argument('--batch-rows', help='rows per COPY or INSERT statement (default 100000 for COPY, 100 for INSERT)',type=int)
+    parser.add_argument('--batch-size', help='size in MB after which a COPY or INSERT statement is ended',type=int,default=64)
+    parser.add_argument('--commit-batches', help='number of statements per transaction',type=int,default=1)
+    parser.add_argument('--single-transaction', help='load every file in a single transaction',action='store_true')
+    parser.add_argument('--synchronous-commit-off', help='turn synchronous_commit off on the import connections',action='store_true')
+    parser.add_argument('--maintenance-work-mem', help='maintenance_work_mem used while building indexes, e.g. 1GB')
+    parser.add_argument('--quarantine-dir', help='directory of <table>.csv files receiving the rows the database rejects, instead of stopping the import')
+    parser.add_argument('--max-error-rate', help='with --quarantine-dir, fraction of rejected rows above which a table is aborted, e.g. 0.01',type=float)
+    parser.add_argument('--relations', help='directory of the Id indexes written during the import, used to index lookup columns and count orphan references afterwards')
+    parser.add_argument('--foreign-keys', help='with --relations, add foreign keys to the lookups pointing to a single object, NOT VALID when they have orphans',action='store_true')
+    parser.add_argument('--report', help='path of the run report with timings per table and stage, .json or .csv')
+    parser.add_argument('--profile', help='directory receiving a <table>.prof cProfile dump per table')
+    parser.add_argument('--profile-table', help='with --profile, only profile this table')
+    parser.add_argument('--journal', help='path of the checkpoint journal')
+    parser.add_argument('--resume', help='resume the interrupted run recorded in the journal',action='store_true')
+    parser.add_argument('--database', help='database type',default='postgresql')
+    parser.add_argument('--sql-host', help='database host',default='localhost')
+    parser.add_argument('--sql-port', help='database port',type=int,default=5432)
+    parser.add_argument('--sql-user', help='database user')
+    parser.add_argument('--sql-password', help='database password')
+    parser.add_argument('--sql-database', help='database name')
+    return parser
+
+
+if (__name__ == "__main__"):
 
+    database = None
+    
+    parser = getArgumentParser()
     args = vars(parser.parse_args())
 
     #print(args)
     #sys.exit(0)
     
-    logLevel = logging.INFO
+    if args["resume"] and not args["journal"]:
+        parser.error('--resume requires --journal')
 
-    if args["debug"]:
-        logLevel = logging.DEBUG    
+    if args["swap"] and args["incremental"]:
+        parser.error('--swap and --incremental can\'t be combined')
 
-    if args["file"]==None and args["directory"]==None:
+    if args["foreign_keys"] and not args["relations"]:
+        parser.error('--foreign-keys requires --relations')
+
+    # a staging table only holds the changed rows, its ids are not those of the table
+    if args["relations"] and args["incremental"]:
+        parser.error('--relations and --incremental can\'t be combined')
+
+    if args["file"]==None and args["directory"]==None and args["archive"]==None:
         parser.parse_args(['-h'])
 
     else:
 
-        # log file
-        if args["log_file"]:
-            logging.basicConfig(filename=args["log_file"], filemode='w', level=logLevel)
-        else:
-            logging.basicConfig(level=logLevel)
-
-        database = psycopg2.connect(
-            host=args["sql_host"],
-            port=args["sql_port"],
-            user=args["sql_user"],
-            password=args["sql_password"],
-            database=args["sql_database"]
-        )
-        database.autocommit = True
+        configureLogging(args)
+
+        if args["engine"] == "arrow" and pyarrow == None:
+            logger.warning('pyarrow is not installed, --engine arrow runs like sync')
+
+        # a new run starts a new journal
+        if args["journal"] and not args["resume"]:
+            open(args["journal"], "w").close()
+
+        database = connectDatabase(args)
         cursor = database.cursor()
 
         # hack for tinyint on PostgreSQL
@@ -492,7 +2859,17 @@ if (__name__ == "__main__"):
         salesforce = Salesforce_to_PostgreSQL()
         salesforce._database = database
 
-        if args["file"]==None:
+        started = time.perf_counter()
+        if args["archive"]!=None:
+            salesforce.resolveArchives(args["archive"])
+        elif args["file"]==None:
             salesforce.resolveDirectory(args["directory"])
         else:
-            salesforce.resolveFile(args["file"])
+            salesforce.resolveObject(salesforce.getTableName(args["file"]), [args["file"]])
+            salesforce.logSchemaCacheStats()
+
+        if args["relations"]:
+            salesforce.resolveRelations()
+
+        if args["report"]:
+            salesforce.writeReport(args["report"], time.perf_counter() - started)